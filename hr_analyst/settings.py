@@ -88,9 +88,81 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 # --- INGESTION SETTINGS ---
-# Controls parallel processing for file uploads and AI scoring
+# Controls parallel processing for file extraction and uploads (AI calls are capped by GEMINI_MAX_IN_FLIGHT)
 INGEST_MAX_WORKERS = int(os.environ.get("INGEST_MAX_WORKERS", "4"))
-INGEST_SCORE_WORKERS = int(os.environ.get("INGEST_SCORE_WORKERS", "4"))
+
+# --- EXTRACTION SETTINGS ---
+# Reuse extracted text for files we have already seen (keyed by SHA-256 of the bytes)
+EXTRACTION_CACHE_ENABLED = os.environ.get("EXTRACTION_CACHE_ENABLED", "1") == "1"
+# Max sandbox processes parsing at once (0 = no cap: one per busy ingest thread).
+# Processes are recycled after EXTRACT_PROCESS_MAX_TASKS documents to cap leaks.
+EXTRACT_PROCESS_WORKERS = int(os.environ.get("EXTRACT_PROCESS_WORKERS", "0"))
+EXTRACT_PROCESS_MAX_TASKS = int(os.environ.get("EXTRACT_PROCESS_MAX_TASKS", "50"))
+# Scanned PDFs are rasterized and OCR'd page by page; memory stays under the ceiling
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", "20"))
+OCR_MEMORY_LIMIT_MB = int(os.environ.get("OCR_MEMORY_LIMIT_MB", "256"))
+OCR_PAGE_WORKERS = int(os.environ.get("OCR_PAGE_WORKERS", "2"))
+# Pages with fewer extractable characters than this are OCR'd; the rest keep their text layer
+OCR_PAGE_MIN_CHARS = int(os.environ.get("OCR_PAGE_MIN_CHARS", "50"))
+# Each document is parsed in a sandbox process: killed after the deadline, and limited
+# to this much extra memory on top of its Django start-up footprint (0 disables the limit)
+EXTRACT_TIMEOUT_SECONDS = int(os.environ.get("EXTRACT_TIMEOUT_SECONDS", "120"))
+EXTRACT_MEMORY_LIMIT_MB = int(os.environ.get("EXTRACT_MEMORY_LIMIT_MB", "1024"))
+# Max antiword processes running at once for legacy .doc files
+ANTIWORD_MAX_CONCURRENCY = int(os.environ.get("ANTIWORD_MAX_CONCURRENCY", "2"))
+# Ingest stores fast-path text immediately and runs OCR / antiword in a background
+# queue, scoring once it finishes. Rows pending longer than the stale window are re-queued.
+OCR_DEFERRED = os.environ.get("OCR_DEFERRED", "1") == "1"
+OCR_QUEUE_WORKERS = int(os.environ.get("OCR_QUEUE_WORKERS", "2"))
+OCR_QUEUE_STALE_MINUTES = int(os.environ.get("OCR_QUEUE_STALE_MINUTES", "30"))
+
+# --- SCORING SETTINGS ---
+# Jobs scored together in one Gemini call (the resume is sent once per call); 1 = one call per job
+SCORE_MAX_JOBS_PER_CALL = int(os.environ.get("SCORE_MAX_JOBS_PER_CALL", "5"))
+# Bulk rescoring of one job: resumes scored together in one Gemini call (1 = one call per resume),
+# the prompt's total token budget, and the largest packed resume still shared (longer ones go alone)
+SCORE_BATCH_MAX_RESUMES = int(os.environ.get("SCORE_BATCH_MAX_RESUMES", "8"))
+SCORE_BATCH_TOKEN_BUDGET = int(os.environ.get("SCORE_BATCH_TOKEN_BUDGET", "12000"))
+SCORE_BATCH_RESUME_MAX_TOKENS = int(os.environ.get("SCORE_BATCH_RESUME_MAX_TOKENS", "1500"))
+# Resume tokens per prompt: cleaned of page furniture and repeats, most relevant sections first
+SCORE_RESUME_TOKEN_BUDGET = int(os.environ.get("SCORE_RESUME_TOKEN_BUDGET", "3000"))
+# Compact scoring answers: short keys, criteria by id only (titles filled in server-side), notes capped
+SCORE_COMPACT_OUTPUT = os.environ.get("SCORE_COMPACT_OUTPUT", "1") == "1"
+SCORE_NOTES_MAX_CHARS = int(os.environ.get("SCORE_NOTES_MAX_CHARS", "160"))
+# Two-stage cascade: a local keyword score (0-100) for every resume x job pair first; only pairs
+# at or above the threshold, or among the job's top K local scores, are sent to Gemini
+PRESCREEN_ENABLED = os.environ.get("PRESCREEN_ENABLED", "1") == "1"
+PRESCREEN_THRESHOLD = float(os.environ.get("PRESCREEN_THRESHOLD", "15"))
+PRESCREEN_TOP_K = int(os.environ.get("PRESCREEN_TOP_K", "20"))
+# Reuse a Gemini score when resume text, job spec, model and prompt version are unchanged
+SCORE_CACHE_ENABLED = os.environ.get("SCORE_CACHE_ENABLED", "1") == "1"
+# Identical scoring requests in flight share one call; how long a caller waits on another
+# process's call (Postgres advisory lock) before scoring the pair itself
+SCORE_COALESCE_WAIT_SECONDS = float(os.environ.get("SCORE_COALESCE_WAIT_SECONDS", "180"))
+# Gemini / Vertex requests in flight per process, shared by ingest, rescoring and commands
+GEMINI_MAX_IN_FLIGHT = int(os.environ.get("GEMINI_MAX_IN_FLIGHT", "8"))
+# Model clients per process, reused across requests (on Vertex each holds its own channel).
+# GEMINI_WARMUP opens them when a web worker or the inbox watcher starts.
+GEMINI_CLIENT_POOL_SIZE = int(os.environ.get("GEMINI_CLIENT_POOL_SIZE", "2"))
+GEMINI_WARMUP = os.environ.get("GEMINI_WARMUP", "1") == "1"
+# Quota shared by all processes through the database (0 = no limit). Throttled calls wait
+# for capacity; 429 / 5xx errors are retried with exponential backoff and jitter.
+GEMINI_RPM = int(os.environ.get("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.environ.get("GEMINI_TPM", "250000"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_BASE_SECONDS = float(os.environ.get("GEMINI_BACKOFF_BASE_SECONDS", "1"))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.environ.get("GEMINI_BACKOFF_MAX_SECONDS", "60"))
+# Deadline per Gemini request; optional hedged second request after the recent p95 latency
+GEMINI_CALL_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_CALL_TIMEOUT_SECONDS", "60"))
+GEMINI_HEDGE_ENABLED = os.environ.get("GEMINI_HEDGE_ENABLED", "0") == "1"
+# Send a response schema with each scoring prompt (JSON mode); answers are strictly parsed either way
+GEMINI_STRUCTURED_OUTPUT = os.environ.get("GEMINI_STRUCTURED_OUTPUT", "1") == "1"
+# Circuit breaker: consecutive timeouts / 5xx before failing fast to keyword scoring, how long
+# to stay open, and how many fallback-scored pairs to rescore once it closes (0 = none)
+GEMINI_BREAKER_FAILURES = int(os.environ.get("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("GEMINI_BREAKER_COOLDOWN_SECONDS", "60"))
+GEMINI_BREAKER_RESCORE_LIMIT = int(os.environ.get("GEMINI_BREAKER_RESCORE_LIMIT", "200"))
 
 # --- AUTOMATION SETTINGS ---
 AUTO_REJECTION_THRESHOLD = int(os.environ.get("AUTO_REJECTION_THRESHOLD", "60"))
@@ -5,3 +5,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hr_analyst.settings")
 
 application = get_wsgi_application()
+
+# Each gunicorn worker imports this after forking: set up the Gemini clients now,
+# in the background, instead of on the first scoring request
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "GEMINI_WARMUP", True):
+    import threading
+
+    from jobs.gemini_clients import warm_up_gemini_clients
+
+    threading.Thread(target=warm_up_gemini_clients, name="gemini-warmup", daemon=True).start()
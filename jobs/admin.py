@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import ChatMessage, ChatSession, ErrorLog, JobDescription, QualificationCriterion, Resume, ResumeScore
+from .models import ChatMessage, ChatSession, ErrorLog, ExtractionCache, JobDescription, JobSpecVersion, ParseFailureStat, ProfileCache, QualificationCriterion, RateLimitBucket, Resume, ResumeScore, ScoreCache
 
 
 class QualificationCriterionInline(admin.TabularInline):
@@ -46,3 +46,42 @@ class ErrorLogAdmin(admin.ModelAdmin):
     list_display = ("location", "message", "created_at", "resolved")
     list_filter = ("resolved",)
     search_fields = ("location", "message")
+
+
+@admin.register(ExtractionCache)
+class ExtractionCacheAdmin(admin.ModelAdmin):
+    list_display = ("content_hash", "method", "fallback_used", "page_count", "elapsed_ms", "hits", "last_used_at")
+    list_filter = ("method", "fallback_used", "extractor_version")
+    search_fields = ("content_hash",)
+
+
+@admin.register(ScoreCache)
+class ScoreCacheAdmin(admin.ModelAdmin):
+    list_display = ("resume_hash", "job_hash", "model_name", "prompt_version", "total_score", "hits", "last_used_at")
+    list_filter = ("model_name", "prompt_version")
+    search_fields = ("resume_hash", "job_hash")
+
+
+@admin.register(ProfileCache)
+class ProfileCacheAdmin(admin.ModelAdmin):
+    list_display = ("resume_hash", "model_name", "prompt_version", "hits", "last_used_at")
+    list_filter = ("model_name", "prompt_version")
+    search_fields = ("resume_hash",)
+
+
+@admin.register(RateLimitBucket)
+class RateLimitBucketAdmin(admin.ModelAdmin):
+    list_display = ("key", "requests", "tokens", "refilled_at")
+
+
+@admin.register(ParseFailureStat)
+class ParseFailureStatAdmin(admin.ModelAdmin):
+    list_display = ("prompt", "model_name", "failures", "repaired", "last_failed_at")
+    list_filter = ("prompt", "model_name")
+
+
+@admin.register(JobSpecVersion)
+class JobSpecVersionAdmin(admin.ModelAdmin):
+    list_display = ("job", "number", "spec_hash", "created_at")
+    list_filter = ("job",)
+    readonly_fields = ("job", "number", "spec_hash", "spec", "created_at")
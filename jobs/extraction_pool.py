@@ -0,0 +1,272 @@
+# jobs/extraction_pool.py
+"""
+Process pool for the CPU-bound extractors (pypdf, python-docx, OCR).
+
+The ingest pipeline fans out over threads, but the extractors are pure Python
+and serialize on the GIL. Threads hand the raw extraction to a sandbox process
+and block on the answer, so the actual parsing runs on every core.
+
+Sandbox processes are started with 'spawn' (never forked from the threaded
+ingest process) and reused: each parses one document at a time in its own
+process group under an address-space limit. A document that overruns
+EXTRACT_TIMEOUT_SECONDS gets its process killed, with any antiword/tesseract
+children, and the next document starts a replacement. EXTRACT_PROCESS_WORKERS
+caps how many run at once; idle ones are recycled after EXTRACT_PROCESS_MAX_TASKS
+documents.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Django setup + parser imports in a fresh process
+START_TIMEOUT_SECONDS = 120
+
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+_idle: List["_SandboxProcess"] = []
+_idle_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    return max(0, int(getattr(settings, "EXTRACT_PROCESS_WORKERS", 0) or 0))
+
+
+def _worker_init():
+    """Runs once per sandbox process: boot Django and import the heavy parsers."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hr_analyst.settings")
+    import django
+    django.setup()
+
+    # Warm imports so the first real document doesn't pay for them
+    import docx  # noqa: F401
+    import pypdf  # noqa: F401
+    import pytesseract  # noqa: F401
+    import pdf2image  # noqa: F401
+    from jobs import services  # noqa: F401
+
+
+def _pool_slots() -> Optional[threading.BoundedSemaphore]:
+    """Caps concurrent pool extractions at EXTRACT_PROCESS_WORKERS. None when disabled."""
+    global _slots
+    size = pool_size()
+    if not size:
+        return None
+    with _pool_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(size)
+            logger.info(f"Extraction process pool enabled (workers={size})")
+        return _slots
+
+
+def warm_up_extraction_pool() -> int:
+    """
+    Starts every pool process up front (Django setup + imports, in parallel) so
+    the first batch doesn't pay for it.
+    """
+    size = pool_size() if _pool_slots() else 0
+    if not size:
+        return 0
+    memory_mb = getattr(settings, "EXTRACT_MEMORY_LIMIT_MB", 0)
+    with ThreadPoolExecutor(max_workers=size) as executor:
+        futures = [executor.submit(_SandboxProcess, memory_mb) for _ in range(size)]
+    ready = 0
+    for future in futures:
+        try:
+            _checkin(future.result())
+            ready += 1
+        except Exception as e:
+            logger.warning(f"Extraction worker warm-up failed: {e}")
+    return ready
+
+
+def shutdown_extraction_pool() -> None:
+    """Stops the idle sandbox processes (busy ones finish their document first). Runs at exit."""
+    with _idle_lock:
+        idle = list(_idle)
+        _idle.clear()
+    for proc in idle:
+        proc.close()
+
+
+# Registered after multiprocessing's own exit hook, so it runs first: the whole process
+# group goes (antiword / tesseract included), not just the sandbox process itself
+atexit.register(shutdown_extraction_pool)
+
+
+def run_extraction_in_pool(file_bytes: bytes, filename: str = "", costly: bool = True):
+    """
+    Runs services._run_extraction in one of the EXTRACT_PROCESS_WORKERS sandbox
+    processes and waits for its ExtractionResult. Returns None if the pool is
+    disabled, so the caller goes through run_sandboxed.
+    """
+    slots = _pool_slots()
+    if slots is None:
+        return None
+    from jobs.services import _run_extraction
+    with slots:
+        return _run_in_sandbox(
+            _run_extraction,
+            (file_bytes, filename, costly),
+            getattr(settings, "EXTRACT_TIMEOUT_SECONDS", 0),
+            getattr(settings, "EXTRACT_MEMORY_LIMIT_MB", 0),
+        )
+
+
+# ==========================================
+# SANDBOX (deadline + memory limit per document)
+# ==========================================
+
+class ExtractionTimeout(Exception):
+    """The document overran EXTRACT_TIMEOUT_SECONDS and was killed."""
+
+
+class ExtractionResourceError(Exception):
+    """The document hit EXTRACT_MEMORY_LIMIT_MB or its process died."""
+
+
+def _current_address_space() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except Exception:
+        return 0
+
+
+def _sandbox_main(conn, memory_mb):
+    """Sandbox process loop: runs one (func, args) at a time until told to stop."""
+    # Own process group, so a timeout also kills antiword / tesseract / pdftoppm
+    os.setpgrp()
+    _worker_init()
+    if memory_mb:
+        # Budget is on top of what the process maps once Django and the parsers are loaded
+        limit = _current_address_space() + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        func, args = task
+        try:
+            conn.send(("ok", func(*args)))
+        except MemoryError:
+            # The heap can't be trusted after this; the parent retires the process
+            conn.send(("memory", f"exceeded {memory_mb} MB"))
+            return
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+def _kill_tree(proc) -> None:
+    if proc.is_alive():
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            proc.kill()
+    proc.join(timeout=5)
+
+
+class _SandboxProcess:
+    """One spawned sandbox process, reused until it times out, dies or uses up its task budget."""
+
+    def __init__(self, memory_mb: int):
+        ctx = multiprocessing.get_context("spawn")
+        self.memory_mb = memory_mb
+        self.tasks = 0
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_sandbox_main, args=(child_conn, memory_mb), name="extraction-sandbox", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        try:
+            if not self.conn.poll(START_TIMEOUT_SECONDS):
+                raise ExtractionResourceError("sandbox process did not start in time")
+            self.conn.recv()
+        except EOFError:
+            self.close()
+            raise ExtractionResourceError(f"sandbox process died on start (exit code {self.process.exitcode})")
+        except BaseException:
+            self.close()
+            raise
+
+    def run(self, func, args, timeout: float):
+        self.tasks += 1
+        self.conn.send((func, args))
+        if not self.conn.poll(timeout or None):
+            raise ExtractionTimeout(f"exceeded {timeout}s deadline")
+        return self.conn.recv()
+
+    def close(self) -> None:
+        _kill_tree(self.process)
+        self.conn.close()
+
+
+def _checkout(memory_mb: int) -> _SandboxProcess:
+    with _idle_lock:
+        for i, proc in enumerate(_idle):
+            if proc.memory_mb == memory_mb:
+                return _idle.pop(i)
+    return _SandboxProcess(memory_mb)
+
+
+def _checkin(proc: _SandboxProcess) -> None:
+    max_tasks = getattr(settings, "EXTRACT_PROCESS_MAX_TASKS", 50)
+    if not proc.process.is_alive() or (max_tasks and proc.tasks >= max_tasks):
+        # Recycled to cap leaks in the native parsers
+        proc.close()
+        return
+    with _idle_lock:
+        _idle.append(proc)
+
+
+def _run_in_sandbox(func, args: tuple, timeout: float, memory_mb: int, fresh: bool = False):
+    proc = _SandboxProcess(memory_mb) if fresh else _checkout(memory_mb)
+    try:
+        status, payload = proc.run(func, args, timeout)
+    except EOFError:
+        proc.close()
+        raise ExtractionResourceError(f"extraction process died (exit code {proc.process.exitcode})")
+    except BaseException:
+        # Timed out or interrupted mid-document: the process is not idle, so it goes
+        proc.close()
+        raise
+
+    if fresh or status == "memory":
+        proc.close()
+    else:
+        _checkin(proc)
+    if status == "ok":
+        return payload
+    if status == "memory":
+        raise ExtractionResourceError(payload)
+    raise RuntimeError(payload)
+
+
+def run_sandboxed(func, *args, timeout: Optional[float] = None, memory_mb: Optional[int] = None, fresh: bool = False):
+    """
+    Runs func(*args) in a sandbox process and returns its result; func, args and the
+    result must pickle. fresh=True uses a new process and retires it afterwards.
+    Raises ExtractionTimeout / ExtractionResourceError instead of hanging the caller.
+    With both limits set to 0 it simply calls func inline.
+    """
+    if timeout is None:
+        timeout = getattr(settings, "EXTRACT_TIMEOUT_SECONDS", 0)
+    if memory_mb is None:
+        memory_mb = getattr(settings, "EXTRACT_MEMORY_LIMIT_MB", 0)
+    if not timeout and not memory_mb and not fresh:
+        return func(*args)
+    return _run_in_sandbox(func, args, timeout, memory_mb, fresh)
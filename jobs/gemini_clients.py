@@ -0,0 +1,139 @@
+# jobs/gemini_clients.py
+"""
+Process-wide registry of Gemini / Vertex model clients.
+
+GeminiEvaluator used to call genai.configure / aiplatform.init and build a new
+GenerativeModel on every construction (each view request, each command run,
+each ingest thread). Now the SDK is configured once per process and the
+evaluator borrows a ModelPool: GEMINI_CLIENT_POOL_SIZE model handles handed out
+round-robin. Each handle keeps its client (and so its HTTP/gRPC channel) once
+opened; on Vertex that's one channel per handle, while in API-key mode the SDK
+shares a single client between them.
+
+The async clients belong to the scoring engine's event loop, so the registry
+is rebuilt after a fork, like the engine itself. warm_up_gemini_clients() does
+the set-up (and opens the channels) at worker start.
+"""
+import itertools
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import google.generativeai as genai
+import vertexai.generative_models as vertex_models
+from google.cloud import aiplatform
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pools: Dict[Tuple, "ModelPool"] = {}
+_pools_pid: Optional[int] = None
+_pools_lock = threading.Lock()
+
+
+class ModelPool:
+    """Round-robin over a few model handles; quacks like a GenerativeModel for the evaluator."""
+
+    def __init__(self, name: str, factory: Callable, size: int):
+        self.name = name
+        self._models = [factory() for _ in range(max(1, size))]
+        self._cycle = itertools.cycle(self._models)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def next_model(self):
+        with self._lock:
+            return next(self._cycle)
+
+    async def generate_content_async(self, content, **kwargs):
+        return await self.next_model().generate_content_async(content, **kwargs)
+
+    def generate_content(self, content, **kwargs):
+        return self.next_model().generate_content(content, **kwargs)
+
+    def json_config(self, schema: dict):
+        """Generation config that constrains answers to `schema` (JSON mode), for this pool's SDK."""
+        if isinstance(self._models[0], genai.GenerativeModel):
+            return genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+        return vertex_models.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+
+    async def open_channels(self) -> None:
+        """Creates each handle's async client on the running loop (best effort, SDK internals)."""
+        for model in self._models:
+            try:
+                if isinstance(model, genai.GenerativeModel):
+                    from google.generativeai import client as genai_client
+                    model._async_client = model._async_client or genai_client.get_default_generative_async_client()
+                else:
+                    model._prediction_async_client
+            except Exception as exc:
+                logger.debug(f"Could not pre-open Gemini channel: {exc}")
+
+
+def _config(api_key: Optional[str]) -> Tuple:
+    api_key = api_key or getattr(settings, "GEMINI_API_KEY", None)
+    if api_key:
+        return ("gemini", api_key, "gemini-2.5-flash")
+    project = getattr(settings, "VERTEX_PROJECT_ID", None)
+    location = getattr(settings, "VERTEX_LOCATION", "us-central1")
+    if project and location:
+        return ("vertex", project, location, getattr(settings, "VERTEX_MODEL", "gemini-1.5-flash"))
+    return ()
+
+
+def _build_pool(config: Tuple) -> Optional[ModelPool]:
+    size = getattr(settings, "GEMINI_CLIENT_POOL_SIZE", 2)
+    if config[0] == "gemini":
+        _, api_key, model_name = config
+        genai.configure(api_key=api_key)
+        logger.info("Using Gemini API key authentication.")
+        return ModelPool(model_name, lambda: genai.GenerativeModel(model_name), size)
+
+    _, project, location, model_name = config
+    try:
+        aiplatform.init(project=project, location=location)
+        pool = ModelPool(f"vertex:{model_name}", lambda: vertex_models.GenerativeModel(model_name), size)
+        logger.info(f"Using Vertex AI auth with model: {model_name}")
+        return pool
+    except Exception:
+        logger.exception("Vertex AI init failed")
+        return None
+
+
+def get_model_pool(api_key: Optional[str] = None) -> Optional[ModelPool]:
+    """The configured ModelPool for this process, or None when neither Gemini nor Vertex is set up."""
+    global _pools_pid
+    config = _config(api_key)
+    if not config:
+        return None
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Clients opened by the parent are tied to its event loop
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(config)
+        if pool is None:
+            pool = _build_pool(config)
+            if pool is not None:
+                _pools[config] = pool
+        return pool
+
+
+def warm_up_gemini_clients() -> int:
+    """
+    Configures the SDK, builds the pool and opens its channels on the scoring
+    engine loop, so the first scoring request doesn't pay for it. Returns the pool size.
+    """
+    from .scoring_engine import get_scoring_engine
+
+    pool = get_model_pool()
+    if pool is None:
+        return 0
+    try:
+        get_scoring_engine().run(pool.open_channels(), timeout=60)
+    except Exception as exc:
+        logger.warning(f"Gemini client warm-up failed: {exc}")
+    return len(pool)
@@ -0,0 +1,140 @@
+# jobs/keyword_matcher.py
+"""
+Compiled matcher behind the keyword scorer (pre-screen and Gemini fallback).
+
+A job's criteria are split into terms once and compiled into an Aho-Corasick
+automaton over word tokens, so a resume is checked against every criterion of
+the job in a single pass over its words. Matching whole tokens gives word
+boundaries for free ("java" no longer hits "javascript").
+
+Compiled criteria are cached per process, keyed on the criteria themselves
+(id and text), so a stale job instance can't get an automaton built from other
+criteria than the ones it passes in.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from .prompt_packing import STOPWORDS, tokenize
+
+CACHE_SIZE = 256
+
+_cache: "OrderedDict[str, CompiledCriteria]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class Automaton:
+    """Aho-Corasick over token sequences. match() returns the ids of every pattern present."""
+
+    def __init__(self, patterns: Sequence[Sequence[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[int]] = [set()]
+
+        # 1. Trie of the patterns
+        for pattern_id, words in enumerate(patterns):
+            node = 0
+            for word in words:
+                if word not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                    self._goto[node][word] = len(self._goto) - 1
+                node = self._goto[node][word]
+            if words:
+                self._out[node].add(pattern_id)
+
+        # 2. Failure links, breadth first (depth-1 nodes fail to the root)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0)
+                self._out[child] |= self._out[self._fail[child]]
+
+    def match(self, words: Iterable[str]) -> Set[int]:
+        found: Set[int] = set()
+        node = 0
+        for word in words:
+            while node and word not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(word, 0)
+            if self._out[node]:
+                found |= self._out[node]
+        return found
+
+
+class CompiledCriteria:
+    """
+    One job's criteria, pre-split into terms. A term scores 1 when its whole phrase
+    appears, otherwise the share of its content words found anywhere in the resume.
+    """
+
+    def __init__(self, criteria: Iterable):
+        patterns: Dict[Tuple[str, ...], int] = {}
+        self.criteria: List[Tuple[int, str, List[Tuple[int, List[int]]]]] = []
+        for criterion in criteria:
+            terms = []
+            for raw in re.split(r"[,\n;/]+", criterion.detail or ""):
+                raw = raw.strip().lower()
+                words = tuple(tokenize(raw)) if len(raw) > 2 else ()
+                if not words:
+                    continue
+                phrase = patterns.setdefault(words, len(patterns))
+                content = [
+                    patterns.setdefault((word,), len(patterns))
+                    for word in dict.fromkeys(words)
+                    if len(word) > 1 and word not in STOPWORDS
+                ]
+                terms.append((phrase, content))
+            self.criteria.append((criterion.id, criterion.detail, terms))
+        self.automaton = Automaton(sorted(patterns, key=patterns.get))
+
+    def score(self, resume_text: str) -> List[Tuple[int, str, float]]:
+        """Returns (criterion_id, detail, score 0-10) per criterion, from one pass over the resume."""
+        found = self.automaton.match(tokenize(resume_text or ""))
+        results = []
+        for criterion_id, detail, terms in self.criteria:
+            hits = 0.0
+            for phrase, content in terms:
+                if phrase in found:
+                    hits += 1
+                elif content:
+                    hits += sum(pattern in found for pattern in content) / len(content)
+            score = min(10.0, hits / len(terms) * 10.0) if terms else 0.0
+            results.append((criterion_id, detail, score))
+        return results
+
+
+def _fingerprint(criteria: Sequence) -> str:
+    digest = hashlib.sha256()
+    for criterion in criteria:
+        digest.update(f"{criterion.id}\x1f{criterion.detail or ''}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compiled_criteria(job, criteria: Iterable) -> CompiledCriteria:
+    """Cached CompiledCriteria for these criteria (job is None: not cached)."""
+    criteria = list(criteria)
+    if job is None or job.pk is None:
+        return CompiledCriteria(criteria)
+    key = _fingerprint(criteria)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = CompiledCriteria(criteria)
+    with _cache_lock:
+        _cache[key] = compiled
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
@@ -0,0 +1,327 @@
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from jobs import services
+from jobs.extraction_pool import run_sandboxed
+
+SKILLS = [
+    "Python", "Django", "PostgreSQL", "REST APIs", "Docker", "Kubernetes", "AWS", "React",
+    "Machine Learning", "Pandas", "Celery", "Redis", "CI/CD", "Terraform", "GraphQL", "Linux",
+]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Hooli", "Stark Industries"]
+NAMES = ["Asha Rao", "Ben Carter", "Chen Wei", "Divya Nair", "Elena Petrova", "Farhan Ali"]
+
+# A document whose extractor returns less than this would trigger a costly fallback
+FALLBACK_MIN_CHARS = 50
+
+
+# ==========================================
+# SYNTHETIC CORPUS
+# ==========================================
+
+def _resume_lines(rng, index):
+    name = rng.choice(NAMES)
+    lines = [
+        f"{name} - Software Engineer",
+        f"{name.split()[0].lower()}.{index}@example.com | +91 98{rng.randint(10000000, 99999999)}",
+        f"linkedin.com/in/{name.split()[0].lower()}-{index}",
+        "",
+        "EXPERIENCE",
+    ]
+    for _ in range(rng.randint(2, 4)):
+        lines.append(f"{rng.choice(COMPANIES)} ({rng.randint(2012, 2020)} - {rng.randint(2021, 2025)})")
+        for _ in range(rng.randint(2, 4)):
+            lines.append(f"- Built services with {rng.choice(SKILLS)} and {rng.choice(SKILLS)}")
+    lines += ["", "SKILLS", ", ".join(rng.sample(SKILLS, 8))]
+    return lines
+
+
+def _pdf_escape(value):
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_pdf(lines, link, pages=2):
+    """Minimal PDF with a real text layer (Helvetica) and a URI link annotation per page."""
+    per_page = max(1, len(lines) // pages + 1)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        chunk = lines[p * per_page:(p + 1) * per_page] or [" "]
+        stream = "BT /F1 11 Tf 14 TL 72 760 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in chunk) + " ET"
+        page_no = len(objects) + 1
+        kids.append(f"{page_no} 0 R")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_no + 1} 0 R /Annots [{page_no + 2} 0 R] >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Annot /Subtype /Link /Rect [72 40 300 60] /A << /S /URI /URI ({link}) >> >>")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _scanned_pdf(lines, pages=2):
+    """Image-only PDF (no text layer), like a phone scan of a printed CV."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default()
+    images = []
+    per_page = max(1, len(lines) // pages + 1)
+    for p in range(pages):
+        img = Image.new("L", (1240, 1754), 255)
+        draw = ImageDraw.Draw(img)
+        for i, line in enumerate(lines[p * per_page:(p + 1) * per_page]):
+            draw.text((100, 120 + i * 40), line, fill=0, font=font)
+        images.append(img)
+    out = io.BytesIO()
+    images[0].save(out, "PDF", resolution=150, save_all=True, append_images=images[1:])
+    return out.getvalue()
+
+
+def _docx(lines, link, rng):
+    """python-docx document with a skills table and an external hyperlink."""
+    import docx
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+
+    table = document.add_table(rows=4, cols=3)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = rng.choice(SKILLS)
+
+    paragraph = document.add_paragraph("Profile: ")
+    r_id = paragraph.part.relate_to(link, RT.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+    run = OxmlElement("w:r")
+    text = OxmlElement("w:t")
+    text.text = link
+    run.append(text)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def _legacy_doc(docx_bytes, workdir):
+    """Word 97-2003 .doc via LibreOffice. Returns None when soffice isn't installed."""
+    soffice = shutil.which("soffice") or shutil.which("libreoffice")
+    if not soffice:
+        return None
+    src = os.path.join(workdir, "convert.docx")
+    with open(src, "wb") as f:
+        f.write(docx_bytes)
+    try:
+        subprocess.run(
+            [soffice, "--headless", "--convert-to", "doc", "--outdir", workdir, src],
+            capture_output=True, timeout=120, check=True,
+        )
+        with open(os.path.join(workdir, "convert.doc"), "rb") as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+def build_corpus(docs_per_kind, seed=42, extra_dir=None):
+    """Returns {kind: [(filename, bytes), ...]} for text_pdf / scanned_pdf / docx / doc / txt."""
+    rng = random.Random(seed)
+    corpus = {"text_pdf": [], "scanned_pdf": [], "docx": [], "doc": [], "txt": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for i in range(docs_per_kind):
+            lines = _resume_lines(rng, i)
+            link = f"https://www.linkedin.com/in/candidate-{i}"
+            corpus["text_pdf"].append((f"text_{i}.pdf", _text_pdf(lines, link)))
+            corpus["scanned_pdf"].append((f"scan_{i}.pdf", _scanned_pdf(lines)))
+            docx_bytes = _docx(lines, link, rng)
+            corpus["docx"].append((f"resume_{i}.docx", docx_bytes))
+            corpus["txt"].append((f"resume_{i}.txt", "\n".join(lines).encode("utf-8")))
+            doc_bytes = _legacy_doc(docx_bytes, workdir)
+            if doc_bytes:
+                corpus["doc"].append((f"legacy_{i}.doc", doc_bytes))
+
+    # Real samples (e.g. legacy .doc files) dropped into a directory, grouped by sniffed format
+    if extra_dir:
+        kinds = {"pdf": "text_pdf", "docx": "docx", "doc": "doc", "text": "txt"}
+        for name in sorted(os.listdir(extra_dir)):
+            path = os.path.join(extra_dir, name)
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    content = f.read()
+                corpus[kinds[services.sniff_format(content, name)]].append((name, content))
+    return corpus
+
+
+# ==========================================
+# MEASUREMENT
+# ==========================================
+
+def _rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _measure(func, docs):
+    """Runs in a fresh sandbox process (see run_sandboxed), so peak RSS is per path."""
+    baseline = _rss_mb()
+    latencies, methods = [], Counter()
+    fallbacks = errors = 0
+    started = time.perf_counter()
+    for name, content in docs:
+        t0 = time.perf_counter()
+        try:
+            output = func(content, name)
+        except Exception:
+            errors += 1
+            output = ""
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if isinstance(output, services.ExtractionResult):
+            methods[output.method] += 1
+            fallbacks += int(output.fallback_used)
+        elif len((output or "").strip()) < FALLBACK_MIN_CHARS:
+            fallbacks += 1  # this path alone would have handed the doc to a costly fallback
+    wall = time.perf_counter() - started
+    result = {
+        "docs": len(docs),
+        "errors": errors,
+        "docs_per_sec": round(len(docs) / wall, 2) if wall else 0.0,
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - baseline, 1),
+        "fallback_rate": round(fallbacks / len(docs), 3) if docs else 0.0,
+    }
+    if methods:
+        result["methods"] = dict(methods)
+    return result
+
+
+PATHS = {
+    # name: (callable(content, filename), corpus kinds, external tools it needs)
+    "pdf_fast": (lambda b, n: services._extract_pdf_fast(io.BytesIO(b)), ["text_pdf", "scanned_pdf"], []),
+    "pdf_ocr": (lambda b, n: services._extract_pdf_ocr(b), ["scanned_pdf"], ["pdftoppm", "tesseract"]),
+    "docx_fast": (lambda b, n: services._extract_docx_fast(io.BytesIO(b)), ["docx"], []),
+    "docx_stream": (lambda b, n: services._extract_docx_stream(b), ["docx"], []),
+    "doc_legacy": (lambda b, n: services._extract_doc_legacy(b, n), ["doc"], ["antiword"]),
+    "pipeline": (
+        lambda b, n: services._run_extraction(b, n),
+        ["text_pdf", "scanned_pdf", "docx", "doc", "txt"],
+        [],
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark the text extractors on a generated resume corpus and print JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=20, help="Documents generated per format.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--paths", nargs="+", choices=sorted(PATHS), help="Only run these paths.")
+        parser.add_argument("--extra-dir", help="Directory of real samples to add (e.g. legacy .doc files).")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+        parser.add_argument("--baseline", help="Previous JSON report; fail on regressions beyond --tolerance.")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%).")
+        parser.add_argument("--timeout", type=int, default=1800, help="Seconds allowed per path.")
+
+    def handle(self, *args, **options):
+        corpus = build_corpus(options["docs"], seed=options["seed"], extra_dir=options.get("extra_dir"))
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "extractor_version": services.EXTRACTOR_VERSION,
+            "python": platform.python_version(),
+            "settings": {
+                key: getattr(settings, key, None)
+                for key in ("OCR_DPI", "OCR_PAGE_WORKERS", "OCR_MEMORY_LIMIT_MB", "OCR_PAGE_MIN_CHARS")
+            },
+            "corpus": {kind: len(docs) for kind, docs in corpus.items()},
+            "paths": {},
+        }
+
+        for name in options.get("paths") or PATHS:
+            func, kinds, tools = PATHS[name]
+            docs = [doc for kind in kinds for doc in corpus[kind]]
+            missing = [tool for tool in tools if not shutil.which(tool)]
+            if missing:
+                report["paths"][name] = {"skipped": f"missing {', '.join(missing)}"}
+            elif not docs:
+                report["paths"][name] = {"skipped": "no documents (pass --extra-dir for real samples)"}
+            else:
+                try:
+                    report["paths"][name] = run_sandboxed(
+                        _measure, func, docs, timeout=options["timeout"], memory_mb=0, fresh=True
+                    )
+                except Exception as e:
+                    report["paths"][name] = {"error": str(e)}
+            self.stderr.write(f"{name}: {report['paths'][name]}")
+
+        payload = json.dumps(report, indent=2)
+        if options.get("output"):
+            with open(options["output"], "w") as f:
+                f.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if options.get("baseline"):
+            regressions = compare_reports(options["baseline"], report, options["tolerance"])
+            if regressions:
+                raise CommandError("Extraction regressions:\n" + "\n".join(regressions))
+            self.stderr.write(self.style.SUCCESS("No regressions against baseline."))
+
+
+def compare_reports(baseline_path, report, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, current in report["paths"].items():
+        previous = baseline.get("paths", {}).get(name, {})
+        if "docs_per_sec" not in current or "docs_per_sec" not in previous:
+            continue
+        if current["docs_per_sec"] < previous["docs_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: docs/sec {previous['docs_per_sec']} -> {current['docs_per_sec']}")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["fallback_rate"] > previous["fallback_rate"] + 0.05:
+            regressions.append(f"{name}: fallback rate {previous['fallback_rate']} -> {current['fallback_rate']}")
+    return regressions
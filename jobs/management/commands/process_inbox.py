@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from jobs.extraction_pool import warm_up_extraction_pool
 from jobs.services import M365InboxReader, ResumeIngestor
 
 
@@ -28,6 +29,7 @@ class Command(BaseCommand):
             )
             return
 
+        warm_up_extraction_pool()
         ingestor = ResumeIngestor()
         saved = ingestor.ingest(attachments)
         self.stdout.write(self.style.SUCCESS(f"Ingested {saved} new resume(s)."))
@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from jobs.models import ResumeScore
-from jobs.services import GeminiEvaluator
+from jobs.services import GeminiEvaluator, rescore_fallback_scores
 
 
 class Command(BaseCommand):
@@ -14,6 +13,12 @@ class Command(BaseCommand):
             type=int,
             help="Stop after processing this many fallback scores (helps for large backlogs).",
         )
+        parser.add_argument("--force", action="store_true", help="Ignore cached Gemini scores and call the model again.")
+        parser.add_argument(
+            "--screened",
+            action="store_true",
+            help="Also promote pairs the local pre-screen kept away from Gemini.",
+        )
 
     def handle(self, *args, **options):
         scorer = GeminiEvaluator()
@@ -25,29 +30,13 @@ class Command(BaseCommand):
             )
             return
 
-        qs = ResumeScore.objects.select_related("resume", "job")
-        if options.get("job"):
-            qs = qs.filter(job_id=options["job"])
-
-        fallback_scores = []
-        for score in qs:
-            detail = score.detail or []
-            has_fallback_note = any((item.get("notes") or "").lower().startswith("fallback") for item in detail)
-            if has_fallback_note or not detail:
-                fallback_scores.append(score)
-            if options.get("limit") and len(fallback_scores) >= options["limit"]:
-                break
-
-        if not fallback_scores:
+        updated = rescore_fallback_scores(
+            job_id=options.get("job"),
+            limit=options.get("limit"),
+            force=options["force"],
+            include_screened=options["screened"],
+        )
+        if not updated:
             self.stdout.write("No fallback scores found to rescore.")
             return
-
-        updated = 0
-        for score in fallback_scores:
-            total, detail = scorer.score_resume_against_job(score.resume.text_content, score.job)
-            score.total_score = total
-            score.detail = detail
-            score.save(update_fields=["total_score", "detail"])
-            updated += 1
-
         self.stdout.write(self.style.SUCCESS(f"Rescored {updated} fallback resume score(s)."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from jobs.services import GeminiEvaluator, rescore_stale_scores
+
+
+class Command(BaseCommand):
+    help = "Rescore only the scores made against an older version of their job's description or criteria."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", type=int, help="Limit rescoring to a specific JobDescription ID (default: all active jobs).")
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Stop after updating this many stale scores; the most important candidates go first.",
+        )
+        parser.add_argument("--force", action="store_true", help="Ignore cached Gemini scores and call the model again.")
+
+    def handle(self, *args, **options):
+        scorer = GeminiEvaluator()
+        if not scorer.model:
+            self.stdout.write(
+                self.style.ERROR(
+                    "Gemini/Vertex is not configured. Set GEMINI_API_KEY or Vertex settings, then rerun."
+                )
+            )
+            return
+
+        updated = rescore_stale_scores(
+            job_id=options.get("job"),
+            limit=options.get("limit"),
+            force=options["force"],
+        )
+        if not updated:
+            self.stdout.write("No stale scores found to rescore.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Rescored {updated} stale resume score(s)."))
@@ -2,6 +2,9 @@ import time
 
 from django.core.management.base import BaseCommand
 
+from jobs.extraction_pool import warm_up_extraction_pool
+from jobs.gemini_clients import warm_up_gemini_clients
+from jobs.ocr_queue import requeue_stale_extractions
 from jobs.services import M365InboxReader, ResumeIngestor
 
 
@@ -38,6 +41,13 @@ class Command(BaseCommand):
                 f"Starting inbox watcher (interval={interval}s, batch={batch}, initial_full={initial_full})"
             )
         )
+        workers = warm_up_extraction_pool()
+        if workers:
+            self.stdout.write(self.style.NOTICE(f"Extraction process pool ready ({workers} worker(s))"))
+        clients = warm_up_gemini_clients()
+        if clients:
+            self.stdout.write(self.style.NOTICE(f"Gemini clients ready ({clients} in pool)"))
+
         first_pass = True
         while True:
             fetch_all = initial_full and first_pass
@@ -47,5 +57,9 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(f"Ingested {saved} new resume(s)."))
             else:
                 self.stdout.write("No new attachments found.")
+            # OCR jobs orphaned by a restart (the pending flag is in the DB)
+            requeued = requeue_stale_extractions(ingestor)
+            if requeued:
+                self.stdout.write(self.style.NOTICE(f"Re-queued {requeued} pending OCR extraction(s)."))
             first_pass = False
             time.sleep(interval)
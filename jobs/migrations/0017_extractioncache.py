@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0016_resume_ingest_failures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('extractor_version', models.CharField(max_length=20)),
+                ('text', models.TextField(blank=True)),
+                ('links', models.JSONField(blank=True, default=list)),
+                ('method', models.CharField(blank=True, max_length=20)),
+                ('elapsed_ms', models.IntegerField(default=0)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-last_used_at'],
+                'unique_together': {('content_hash', 'extractor_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0017_extractioncache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractioncache',
+            name='fallback_used',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='extractioncache',
+            name='page_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0018_extractioncache_page_count_fallback'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='extraction_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='extraction_queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='resumeactivitylog',
+            name='action_type',
+            field=models.CharField(choices=[('INGESTED', 'Resume Ingested'), ('SCORED', 'AI Scored'), ('RESCORED', 'Rescored'), ('STATUS_CHANGE', 'Status Changed'), ('EMAIL_SENT', 'Email Sent'), ('NOTE_ADDED', 'Note Added'), ('FAVORITE', 'Marked as Favorite'), ('UNFAVORITE', 'Unmarked Favorite'), ('RATED', 'Manager Rated'), ('EXTRACTED', 'Deferred Extraction Done')], max_length=20),
+        ),
+    ]
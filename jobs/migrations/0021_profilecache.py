@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0020_scorecache'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='scorecache',
+            name='profile',
+        ),
+        migrations.CreateModel(
+            name='ProfileCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resume_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=100)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('profile', models.JSONField(blank=True, default=dict)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-last_used_at'],
+                'unique_together': {('resume_hash', 'model_name', 'prompt_version')},
+            },
+        ),
+    ]
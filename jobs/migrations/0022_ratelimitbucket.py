@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0021_profilecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('requests', models.FloatField(default=0)),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0022_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumescore',
+            name='prescreen_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resumescore',
+            name='screened_out',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+def flag_existing_fallbacks(apps, schema_editor):
+    # Same test rescore_fallback used to run over every score
+    # (an empty detail only when the job has criteria: without any, empty is the real score)
+    ResumeScore = apps.get_model('jobs', 'ResumeScore')
+    QualificationCriterion = apps.get_model('jobs', 'QualificationCriterion')
+    with_criteria = set(QualificationCriterion.objects.values_list('job_id', flat=True).distinct())
+    flagged = [
+        score.pk
+        for score in ResumeScore.objects.only('pk', 'job_id', 'detail').iterator(chunk_size=500)
+        if (not score.detail and score.job_id in with_criteria)
+        or any((item.get('notes') or '').lower().startswith('fallback') for item in score.detail or [])
+    ]
+    ResumeScore.objects.filter(pk__in=flagged).update(fallback_scored=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0023_resumescore_prescreen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumescore',
+            name='fallback_scored',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(flag_existing_fallbacks, migrations.RunPython.noop),
+    ]
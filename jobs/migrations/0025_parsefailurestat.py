@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0024_resumescore_fallback_scored'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseFailureStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt', models.CharField(max_length=50)),
+                ('model_name', models.CharField(max_length=100)),
+                ('failures', models.IntegerField(default=0)),
+                ('repaired', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('last_failed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('prompt', 'model_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:39
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_existing_jobs(apps, schema_editor):
+    # v1 = each job's spec today (same shape and hash as services.job_spec); existing scores
+    # are assumed to match it, since nothing recorded what they were scored against
+    JobDescription = apps.get_model('jobs', 'JobDescription')
+    JobSpecVersion = apps.get_model('jobs', 'JobSpecVersion')
+    ResumeScore = apps.get_model('jobs', 'ResumeScore')
+    for job in JobDescription.objects.all().iterator():
+        spec = {
+            'name': job.name,
+            'summary': job.summary,
+            'criteria': sorted([c.id, c.detail] for c in job.criteria.all()),
+        }
+        spec_hash = hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+        version = JobSpecVersion.objects.create(job=job, number=1, spec_hash=spec_hash, spec=spec)
+        ResumeScore.objects.filter(job=job).update(spec_version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0025_parsefailurestat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobSpecVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('spec_hash', models.CharField(db_index=True, max_length=64)),
+                ('spec', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spec_versions', to='jobs.jobdescription')),
+            ],
+            options={
+                'ordering': ['job', '-number'],
+                'unique_together': {('job', 'number')},
+            },
+        ),
+        migrations.AddField(
+            model_name='resumescore',
+            name='spec_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scores', to='jobs.jobspecversion'),
+        ),
+        migrations.RunPython(snapshot_existing_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:06
+
+from django.db import migrations
+
+
+def unflag_criterionless_fallbacks(apps, schema_editor):
+    # 0024 flagged every empty detail, including jobs with no criteria, where an
+    # empty detail is the real score and a Gemini rescore can never change it
+    ResumeScore = apps.get_model('jobs', 'ResumeScore')
+    QualificationCriterion = apps.get_model('jobs', 'QualificationCriterion')
+    with_criteria = QualificationCriterion.objects.values_list('job_id', flat=True)
+    ResumeScore.objects.filter(fallback_scored=True, detail=[]).exclude(job_id__in=with_criteria).update(
+        fallback_scored=False
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0026_job_spec_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(unflag_criterionless_fallbacks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0027_unflag_criterionless_fallbacks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='attachment_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -188,6 +188,7 @@
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class ResumeSource(models.TextChoices):
@@ -220,6 +221,43 @@ class QualificationCriterion(models.Model):
     def __str__(self) -> str:
         return f"{self.job.name} criterion {self.id}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._touch_job()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._touch_job()
+        return result
+
+    def _touch_job(self):
+        # Criteria are part of the job: editing one counts as editing the job
+        JobDescription.objects.filter(pk=self.job_id).update(updated_at=timezone.now())
+
+
+class JobSpecVersion(models.Model):
+    """
+    Immutable snapshot of what the model is shown for a job (name, summary, criteria).
+    A new number is added whenever that changes; each ResumeScore points at the one it used.
+    """
+    job = models.ForeignKey(JobDescription, related_name="spec_versions", on_delete=models.CASCADE)
+    number = models.PositiveIntegerField()
+    spec_hash = models.CharField(max_length=64, db_index=True)
+    spec = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("job", "number")
+        ordering = ["job", "-number"]
+
+    def __str__(self) -> str:
+        return f"{self.job.name} v{self.number}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Job spec versions are immutable; create a new one instead.")
+        super().save(*args, **kwargs)
+
 
 class Resume(models.Model):
     # --- Standard Fields ---
@@ -252,6 +290,12 @@ class Resume(models.Model):
 
     ingest_failures = models.IntegerField(default=0)
 
+    # --- DEFERRED EXTRACTION (OCR / antiword run in jobs/ocr_queue.py) ---
+    extraction_pending = models.BooleanField(default=False)
+    extraction_queued_at = models.DateTimeField(null=True, blank=True)
+    # SHA-256 of the attachment bytes: a re-sent file still waiting on OCR has no text to dedupe on
+    attachment_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+
     # --- ENHANCED TRACKING FIELDS ---
     STATUS_CHOICES = [
         ('NEW', 'New / Pending'),             # Just arrived, not scored yet
@@ -295,6 +339,16 @@ class ResumeScore(models.Model):
     job = models.ForeignKey(JobDescription, related_name="resume_scores", on_delete=models.CASCADE)
     total_score = models.FloatField(default=0)
     detail = models.JSONField(default=list)
+    # Local keyword score from the pre-screen; screened_out = Gemini was skipped and
+    # total_score is that local score until the pair is promoted (rescored)
+    prescreen_score = models.FloatField(null=True, blank=True)
+    screened_out = models.BooleanField(default=False)
+    # Scored by the keyword fallback because Gemini failed / its breaker was open; rescored on recovery
+    fallback_scored = models.BooleanField(default=False, db_index=True)
+    # Job spec the score was computed against; a different hash from the job's current one = stale
+    spec_version = models.ForeignKey(
+        JobSpecVersion, related_name="scores", null=True, blank=True, on_delete=models.SET_NULL
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -361,6 +415,7 @@ class ResumeActivityLog(models.Model):
         ('FAVORITE', 'Marked as Favorite'),
         ('UNFAVORITE', 'Unmarked Favorite'),
         ('RATED', 'Manager Rated'),
+        ('EXTRACTED', 'Deferred Extraction Done'),
     ]
 
     resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='logs')
@@ -374,3 +429,96 @@ class ResumeActivityLog(models.Model):
 
     def __str__(self):
         return f"{self.get_action_type_display()} - {self.resume.candidate_name}"
+
+
+class ExtractionCache(models.Model):
+    """Extracted text keyed by the SHA-256 of the attachment bytes + extractor version."""
+    content_hash = models.CharField(max_length=64)
+    extractor_version = models.CharField(max_length=20)
+    text = models.TextField(blank=True)
+    links = models.JSONField(default=list, blank=True)
+    page_count = models.IntegerField(default=0)
+    method = models.CharField(max_length=20, blank=True)  # fast_pdf / fast_pdf+ocr / ocr / fast_docx / antiword / text
+    fallback_used = models.BooleanField(default=False)
+    elapsed_ms = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("content_hash", "extractor_version")
+        ordering = ["-last_used_at"]
+
+    def __str__(self) -> str:
+        return f"{self.content_hash[:12]} ({self.method}, v{self.extractor_version})"
+
+
+class ScoreCache(models.Model):
+    """Gemini score for (resume text, job spec, model, prompt version); reused instead of a new call."""
+    resume_hash = models.CharField(max_length=64)
+    job_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=20)
+    total_score = models.FloatField(default=0)
+    detail = models.JSONField(default=list)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("resume_hash", "job_hash", "model_name", "prompt_version")
+        ordering = ["-last_used_at"]
+
+    def __str__(self) -> str:
+        return f"{self.resume_hash[:12]} x {self.job_hash[:12]} ({self.model_name}, v{self.prompt_version})"
+
+
+class ProfileCache(models.Model):
+    """Gemini candidate profile per resume text; the profile doesn't depend on the job."""
+    resume_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=20)
+    profile = models.JSONField(default=dict, blank=True)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("resume_hash", "model_name", "prompt_version")
+        ordering = ["-last_used_at"]
+
+    def __str__(self) -> str:
+        return f"{self.resume_hash[:12]} ({self.model_name}, v{self.prompt_version})"
+
+
+class RateLimitBucket(models.Model):
+    """
+    Shared token bucket for Gemini quota (requests/min and tokens/min).
+    One row per model; every process takes capacity under a row lock.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    requests = models.FloatField(default=0)
+    tokens = models.FloatField(default=0)
+    refilled_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.requests:.1f} req, {self.tokens:.0f} tok"
+
+
+class ParseFailureStat(models.Model):
+    """
+    Gemini answers rejected by the strict JSON parser, per prompt and model.
+    `repaired` counts the ones the single repair retry fixed; the rest fell back.
+    """
+    prompt = models.CharField(max_length=50)
+    model_name = models.CharField(max_length=100)
+    failures = models.IntegerField(default=0)
+    repaired = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    last_failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("prompt", "model_name")
+
+    def __str__(self) -> str:
+        return f"{self.prompt} @ {self.model_name}: {self.failures} failed, {self.repaired} repaired"
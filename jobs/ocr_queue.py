@@ -0,0 +1,135 @@
+# jobs/ocr_queue.py
+"""
+Background queue for the costly extraction step (page OCR / antiword).
+
+With OCR_DEFERRED on, ingest saves the resume straight away with whatever the
+fast extractors found, flags it extraction_pending and hands the file to this
+queue. When the full extraction lands the text is stored and the resume is
+scored for its jobs, exactly as an inline ingest would have done.
+
+The flag lives on the Resume row, so nothing is lost on restart:
+requeue_stale_extractions() (called by watch_inbox) picks up rows that have
+been pending for longer than OCR_QUEUE_STALE_MINUTES.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobDescription, Resume
+from .utils import log_activity
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, int(getattr(settings, "OCR_QUEUE_WORKERS", 2) or 1))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-queue")
+        return _executor
+
+
+def enqueue_extraction(resume: Resume, file_bytes: Optional[bytes], jobs: List[JobDescription], ingestor=None) -> None:
+    """Marks the resume pending and schedules the full extraction + scoring."""
+    Resume.objects.filter(pk=resume.pk).update(extraction_pending=True, extraction_queued_at=timezone.now())
+    job_ids = [job.pk for job in jobs]
+    logger.info(f"Queued deferred extraction for resume {resume.pk} ({resume.attachment_name})")
+    _get_executor().submit(_complete_extraction, resume.pk, file_bytes, job_ids, ingestor)
+
+
+def _complete_extraction(resume_id: int, file_bytes: Optional[bytes], job_ids: List[int], ingestor=None) -> None:
+    # Import here to avoid circular dependency (services imports this module lazily)
+    from .services import (
+        ResumeIngestor,
+        clean_string,
+        download_resume_file,
+        extract_document,
+        extract_email_from_text,
+        extract_phone_number,
+        record_error,
+    )
+
+    close_old_connections()
+    resume = None
+    try:
+        resume = Resume.objects.filter(pk=resume_id, extraction_pending=True).first()
+        if resume is None:
+            return  # finished by another worker / superseded by a re-ingest
+
+        ingestor = ingestor or ResumeIngestor(defer_ocr=False)
+
+        # 1. Full extraction (OCR / antiword allowed)
+        if file_bytes is None:
+            file_bytes = download_resume_file(resume, ingestor.uploader)
+        if not file_bytes:
+            raise ValueError("Original file could not be downloaded")
+        extraction = extract_document(file_bytes, filename=resume.attachment_name)
+        text_content = clean_string(extraction.text)
+
+        # 2. Fill what the fast pass couldn't see
+        if text_content:
+            resume.text_content = text_content
+            phone = extract_phone_number(text_content)
+            email = extract_email_from_text(text_content)
+            if phone and not resume.candidate_phone: resume.candidate_phone = phone
+            if email and not resume.candidate_email: resume.candidate_email = email
+        resume.extraction_pending = False
+        resume.extraction_queued_at = None
+        resume.save(update_fields=[
+            "text_content", "candidate_phone", "candidate_email",
+            "extraction_pending", "extraction_queued_at",
+        ])
+        log_activity(resume, 'EXTRACTED', f"{extraction.method or 'none'} finished in {extraction.elapsed_ms} ms")
+
+        # 3. Score for the jobs of the original ingest that are still open
+        jobs = list(JobDescription.objects.filter(active=True, pk__in=job_ids)) if job_ids \
+            else list(JobDescription.objects.filter(active=True))
+        ingestor._score_resume_for_jobs(resume, resume.text_content, jobs)
+
+    except Exception as exc:
+        logger.exception(f"Deferred extraction failed for resume {resume_id}")
+        if resume is not None:
+            # Don't leave it pending forever; the error log has the details
+            Resume.objects.filter(pk=resume_id).update(extraction_pending=False, extraction_queued_at=None)
+        record_error("ocr_queue", str(exc), context={"resume_id": resume_id}, resume=resume)
+    finally:
+        close_old_connections()
+
+
+def requeue_stale_extractions(ingestor=None, limit: int = 20) -> int:
+    """
+    Re-queues resumes left pending by a process that died mid-OCR.
+    The conditional update claims each row, so several watchers can run this safely.
+    """
+    stale_minutes = getattr(settings, "OCR_QUEUE_STALE_MINUTES", 30)
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=stale_minutes)
+    stale = (
+        Resume.objects.filter(extraction_pending=True)
+        .filter(Q(extraction_queued_at__lt=cutoff) | Q(extraction_queued_at__isnull=True))
+        .order_by("received_at")[:limit]
+    )
+    requeued = 0
+    for resume in stale:
+        claimed = Resume.objects.filter(
+            pk=resume.pk, extraction_queued_at=resume.extraction_queued_at
+        ).update(extraction_queued_at=now)
+        if not claimed:
+            continue
+        # Original jobs aren't stored; score against every active job
+        _get_executor().submit(_complete_extraction, resume.pk, None, [], ingestor)
+        requeued += 1
+    if requeued:
+        logger.info(f"Re-queued {requeued} stale deferred extraction(s)")
+    return requeued
@@ -0,0 +1,132 @@
+# jobs/prompt_packing.py
+"""
+Packs resume text into the Gemini prompt under a token budget.
+
+A hard character clip drops the end of long CVs (often the skills section) and
+still spends tokens on page numbers and headers repeated on every page. Here
+the text is cleaned, split into sections at headings, and when it doesn't fit
+the sections sharing the most terms with the job's criteria go in first. The
+chosen sections keep their original order so the model still reads a resume.
+"""
+import math
+import re
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+# Same ~4 chars per token estimate the rate limiter uses
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_PAGE_FURNITURE = re.compile(
+    r"^(page\s*\d+(\s*(of|/)\s*\d+)?|-?\s*\d{1,3}\s*-?|\d+\s*/\s*\d+|curriculum vitae|resume|r[eé]sum[eé]|cv)$",
+    re.IGNORECASE,
+)
+_HEADINGS = {
+    "summary", "profile", "professional summary", "objective", "career objective", "about me",
+    "experience", "work experience", "professional experience", "employment", "employment history",
+    "work history", "career history", "education", "academic background", "qualifications",
+    "skills", "technical skills", "key skills", "core competencies", "tools", "technologies",
+    "projects", "key projects", "certifications", "certificates", "courses", "training",
+    "achievements", "accomplishments", "awards", "publications", "languages", "interests",
+    "hobbies", "volunteering", "references", "personal details", "contact",
+}
+STOPWORDS = {
+    "and", "the", "for", "with", "of", "in", "on", "to", "a", "an", "or", "at", "by", "as", "is",
+    "be", "are", "from", "using", "use", "experience", "years", "year", "strong", "good", "knowledge",
+    "ability", "skills", "skill", "working", "work", "must", "should", "have", "has", "least", "plus",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [w.strip(".") for w in _WORD.findall(text.lower())]
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip().rstrip(":").strip()
+    if not stripped or len(stripped) > 40 or len(stripped.split()) > 5:
+        return False
+    if stripped.lower() in _HEADINGS:
+        return True
+    # ALL-CAPS short lines ("WORK EXPERIENCE") or a label ending in a colon
+    return (stripped.isupper() and any(c.isalpha() for c in stripped)) or line.strip().endswith(":")
+
+
+def clean_lines(text: str) -> List[str]:
+    """Drops blank lines, page furniture and repeats (headers/footers printed on every page)."""
+    seen = set()
+    lines = []
+    for raw in (text or "").splitlines():
+        line = " ".join(raw.split())
+        if not line or _PAGE_FURNITURE.match(line):
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def split_sections(lines: List[str]) -> List[List[str]]:
+    """Groups lines under their headings; whatever precedes the first heading is the header block."""
+    sections: List[List[str]] = [[]]
+    for line in lines:
+        if _is_heading(line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+    return [section for section in sections if section]
+
+
+def _relevance(section: List[str], terms: set) -> float:
+    words = tokenize(" ".join(section))
+    if not words or not terms:
+        return 0.0
+    hits = [w for w in words if w in terms]
+    # Distinct criteria terms matter most; repeats add a little; long sections are damped
+    return (len(set(hits)) + 0.25 * len(hits)) / math.sqrt(len(words))
+
+
+def pack_resume(text: str, queries: Iterable[str] = (), token_budget: Optional[int] = None) -> str:
+    """
+    Returns the resume cleaned and cut to `token_budget` (SCORE_RESUME_TOKEN_BUDGET).
+    `queries` are the texts relevance is measured against (the criteria of the job(s));
+    without them the sections are kept in reading order.
+    """
+    budget = token_budget or getattr(settings, "SCORE_RESUME_TOKEN_BUDGET", 3000)
+    max_chars = budget * CHARS_PER_TOKEN
+    lines = clean_lines(text)
+    cleaned = "\n".join(lines)
+    if len(cleaned) <= max_chars:
+        return cleaned
+
+    sections = split_sections(lines)
+    terms = {w for q in queries for w in tokenize(q or "") if len(w) > 1 and w not in STOPWORDS}
+
+    # 1. Header (name, contact) first, then sections by relevance; ties keep document order
+    order = [0] + sorted(range(1, len(sections)), key=lambda i: -_relevance(sections[i], terms))
+
+    # 2. Fill the budget; a section that doesn't fit contributes its most relevant lines
+    chosen = {}
+    remaining = max_chars
+    for idx in order:
+        section = sections[idx]
+        size = sum(len(line) + 1 for line in section)
+        if size <= remaining:
+            chosen[idx] = section
+            remaining -= size
+            continue
+        keep = set()
+        # Heading first, then matching lines, then the rest in order
+        ranked = sorted(range(len(section)), key=lambda i: (i != 0, -len(terms.intersection(tokenize(section[i])))))
+        for i in ranked:
+            if len(section[i]) + 1 <= remaining:
+                keep.add(i)
+                remaining -= len(section[i]) + 1
+        if keep:
+            chosen[idx] = [section[i] for i in sorted(keep)]
+        if remaining < 40:
+            break
+
+    # 3. Back in reading order
+    return "\n\n".join("\n".join(chosen[idx]) for idx in sorted(chosen))
@@ -0,0 +1,133 @@
+# jobs/rate_limit.py
+"""
+Gemini quota handling shared by every process (web, watch_inbox, commands).
+
+Requests/min and tokens/min are token buckets stored in RateLimitBucket and
+taken under a row lock, so the web process, the inbox watcher and background
+rescoring draw from one budget. A call that finds the bucket empty sleeps
+until it refills instead of failing over to keyword scoring.
+
+Quota (429) and server (5xx) errors that slip through are retried with
+exponential backoff and full jitter, honouring any retry delay the API sends.
+"""
+import asyncio
+import logging
+import random
+import re
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import RateLimitBucket
+from .utils import db_call
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Output tokens reserved per call until the response reports real usage
+OUTPUT_TOKEN_ESTIMATE = 1024
+# Gemini quota errors say e.g. "Please retry in 23.4s" or "retry_delay { seconds: 23 }"
+_RETRY_HINT = re.compile(r"retry in ([\d.]+)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+
+def _limits():
+    return getattr(settings, "GEMINI_RPM", 60), getattr(settings, "GEMINI_TPM", 250000)
+
+
+def estimate_tokens(content) -> int:
+    """Rough prompt size (~4 chars per token) plus room for the answer."""
+    parts = content if isinstance(content, (list, tuple)) else [content]
+    return sum(len(str(part)) for part in parts) // 4 + OUTPUT_TOKEN_ESTIMATE
+
+
+def _take(key: str, tokens: int) -> float:
+    """Takes one request and `tokens` from the bucket. Returns 0 on success, else seconds to wait."""
+    rpm, tpm = _limits()
+    if rpm <= 0 and tpm <= 0:
+        return 0.0
+    # A prompt bigger than the whole minute's budget would otherwise never fit
+    tokens = min(tokens, tpm) if tpm > 0 else 0
+
+    now = timezone.now()
+    with transaction.atomic():
+        bucket, _ = RateLimitBucket.objects.select_for_update().get_or_create(
+            key=key, defaults={"requests": rpm, "tokens": tpm, "refilled_at": now}
+        )
+        # 1. Refill for the time since the last take
+        elapsed = max(0.0, (now - bucket.refilled_at).total_seconds())
+        bucket.requests = min(rpm, bucket.requests + elapsed * rpm / 60.0)
+        bucket.tokens = min(tpm, bucket.tokens + elapsed * tpm / 60.0)
+        bucket.refilled_at = now
+
+        # 2. Time until both buckets hold enough
+        wait = 0.0
+        if rpm > 0 and bucket.requests < 1:
+            wait = (1 - bucket.requests) * 60.0 / rpm
+        if tpm > 0 and bucket.tokens < tokens:
+            wait = max(wait, (tokens - bucket.tokens) * 60.0 / tpm)
+
+        # 3. Take it if it's there
+        if wait <= 0:
+            bucket.requests -= 1 if rpm > 0 else 0
+            bucket.tokens -= tokens
+        bucket.save(update_fields=["requests", "tokens", "refilled_at"])
+    return wait
+
+
+def record_usage(key: str, estimated: int, actual: int) -> None:
+    """Settles the token bucket with what the response reported (may refund or overdraw)."""
+    _, tpm = _limits()
+    if tpm <= 0 or not actual or actual == estimated:
+        return
+    RateLimitBucket.objects.filter(key=key).update(tokens=Least(F("tokens") - (actual - estimated), tpm))
+
+
+async def acquire(key: str, tokens: int) -> None:
+    """Waits until the shared bucket has room for one call of `tokens`."""
+    while True:
+        wait = await db_call(_take, key, tokens)
+        if wait <= 0:
+            return
+        logger.debug(f"Gemini rate limit: waiting {wait:.1f}s for {key}")
+        # Jitter so callers woken together don't all hit the row at once
+        await asyncio.sleep(wait + random.uniform(0, 0.25))
+
+
+async def try_acquire(key: str, tokens: int) -> bool:
+    """Takes capacity only if it's there right now (hedged requests never wait for quota)."""
+    return await db_call(_take, key, tokens) <= 0
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Server-suggested delay: Retry-After header, RetryInfo detail or the message text."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("Retry-After"):
+            return float(headers["Retry-After"])
+    except (TypeError, ValueError):
+        pass
+    for detail in getattr(exc, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None and getattr(delay, "seconds", None) is not None:
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+    match = _RETRY_HINT.search(str(exc))
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
+
+
+def retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+    """Seconds to sleep before retry number `attempt` + 1, or None if the error isn't retryable."""
+    # google.api_core exceptions carry the HTTP status as .code
+    status = getattr(exc, "code", None)
+    if status not in RETRYABLE_STATUS:
+        return None
+    base = getattr(settings, "GEMINI_BACKOFF_BASE_SECONDS", 1.0)
+    cap = getattr(settings, "GEMINI_BACKOFF_MAX_SECONDS", 60.0)
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    return max(delay, _retry_after(exc) or 0.0)
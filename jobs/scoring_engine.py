@@ -0,0 +1,306 @@
+# jobs/scoring_engine.py
+"""
+Process-wide async engine for Gemini / Vertex calls.
+
+One event loop runs on a daemon thread; every model call goes through
+ScoringEngine.generate(), which holds a single asyncio.Semaphore of
+GEMINI_MAX_IN_FLIGHT. However many ingest threads, rescore threads or
+commands are active, the process never has more calls in flight than that.
+
+Sync code hands coroutines over with run() (wait for one) or imap() (keep a
+bounded window of work queued and consume results as they finish).
+
+Quota across processes and retries of 429 / 5xx errors are in rate_limit.py.
+
+Each call also has a deadline (GEMINI_CALL_TIMEOUT_SECONDS), may be hedged with
+a second request once it runs past the recent p95 latency, and passes a
+per-model circuit breaker: after GEMINI_BREAKER_FAILURES consecutive outages
+calls fail fast with CircuitOpenError (callers fall back to keywords) until a
+trial call succeeds, at which point the fallback-scored pairs are rescored.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+
+from .rate_limit import acquire, estimate_tokens, record_usage, retry_delay, try_acquire
+from .utils import db_call
+
+logger = logging.getLogger(__name__)
+
+_engine: Optional["ScoringEngine"] = None
+_engine_lock = threading.Lock()
+
+OUTAGE_STATUS = {500, 502, 503, 504}
+# Latency samples needed before hedging kicks in
+HEDGE_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the model while its circuit breaker is open."""
+
+
+def is_outage(exc: Exception) -> bool:
+    """Timeouts, 5xx and connection failures count against the breaker; 4xx / 429 don't."""
+    return (
+        isinstance(exc, (asyncio.TimeoutError, ConnectionError))
+        or getattr(exc, "code", None) in OUTAGE_STATUS
+    )
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `threshold` consecutive outages; after `cooldown` one
+    trial call is let through (half-open) and its outcome closes or re-opens it.
+    Only touched from the engine loop, so no locking.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float, on_close: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.on_close = on_close
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError when open; returns True when this call is the half-open trial."""
+        if self.opened_at is None:
+            return False
+        if self.state == "open" or self._trial_running:
+            raise CircuitOpenError(f"Gemini circuit for {self.name} is open; failing fast")
+        self._trial_running = True
+        return True
+
+    def record_success(self) -> None:
+        recovered = self.opened_at is not None
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        if recovered:
+            logger.info(f"Gemini circuit for {self.name} closed")
+            if self.on_close:
+                self.on_close(self.name)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None or self._trial_running:
+                logger.warning(f"Gemini circuit for {self.name} opened after {self.failures} failure(s)")
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release_trial(self) -> None:
+        """The trial ended without telling us anything (e.g. throttled); let another call try."""
+        self._trial_running = False
+
+
+class ScoringEngine:
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.hedges = 0
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        # Binds to the engine loop on first use (Python 3.10+)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: deque = deque(maxlen=200)
+        self._thread = threading.Thread(target=self._run_loop, name="scoring-engine", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def breaker(self, bucket: str) -> CircuitBreaker:
+        if bucket not in self._breakers:
+            self._breakers[bucket] = CircuitBreaker(
+                bucket,
+                getattr(settings, "GEMINI_BREAKER_FAILURES", 5),
+                getattr(settings, "GEMINI_BREAKER_COOLDOWN_SECONDS", 60),
+                on_close=_rescore_after_recovery,
+            )
+        return self._breakers[bucket]
+
+    def _hedge_delay(self) -> Optional[float]:
+        """p95 of recent successful call latencies, once there are enough samples."""
+        if not getattr(settings, "GEMINI_HEDGE_ENABLED", False) or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        samples = sorted(self._latencies)
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    async def _call(self, model, content, bucket: str, tokens: int, generation_config=None):
+        """
+        One request under the deadline. Past the p95 delay a second, identical
+        request is raced against it, but only if a slot and quota are free right
+        now, so hedges never queue or break the in-flight cap.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = getattr(settings, "GEMINI_CALL_TIMEOUT_SECONDS", 60)
+        started = loop.time()
+        hedge_delay = self._hedge_delay()
+        hedge_at = started + hedge_delay if hedge_delay is not None else None
+        kwargs = {"generation_config": generation_config} if generation_config is not None else {}
+        tasks = {asyncio.ensure_future(model.generate_content_async(content, **kwargs))}
+        error: Optional[BaseException] = None
+        try:
+            while tasks:
+                until = started + deadline
+                if hedge_at is not None:
+                    until = min(until, hedge_at)
+                done, tasks = await asyncio.wait(tasks, timeout=max(0.0, until - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._latencies.append(loop.time() - started)
+                        return task.result()
+                    error = task.exception()
+                if not tasks:
+                    break
+                if loop.time() >= started + deadline:
+                    raise asyncio.TimeoutError(f"Gemini call exceeded {deadline}s")
+                if hedge_at is not None and loop.time() >= hedge_at:
+                    hedge_at = None
+                    if not self._semaphore.locked() and await try_acquire(bucket, tokens):
+                        await self._semaphore.acquire()
+                        hedge = asyncio.ensure_future(model.generate_content_async(content, **kwargs))
+                        hedge.add_done_callback(lambda _: self._semaphore.release())
+                        tasks.add(hedge)
+                        self.hedges += 1
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate(self, model, content, bucket: str = "gemini", generation_config=None):
+        """
+        The only place a model request is made. Waits for a free slot and for
+        quota in the shared bucket, and retries quota / server errors with backoff.
+        Fails fast with CircuitOpenError while the model's breaker is open.
+        """
+        tokens = estimate_tokens(content)
+        max_retries = getattr(settings, "GEMINI_MAX_RETRIES", 5)
+        breaker = self.breaker(bucket)
+        attempt = 0
+        while True:
+            trial = breaker.before_call()
+            settled = False
+            try:
+                async with self._semaphore:
+                    await acquire(bucket, tokens)
+                    self.in_flight += 1
+                    try:
+                        response = await self._call(model, content, bucket, tokens, generation_config)
+                    except Exception as exc:
+                        settled = True
+                        if is_outage(exc):
+                            breaker.record_failure()
+                        elif getattr(exc, "code", None) == 429:
+                            breaker.release_trial()
+                        else:
+                            # Any other answer (e.g. 400) means the service is up
+                            breaker.record_success()
+                        delay = retry_delay(exc, attempt) if attempt < max_retries else None
+                        if delay is None:
+                            raise
+                        error = exc
+                    else:
+                        settled = True
+                        breaker.record_success()
+                        usage = getattr(response, "usage_metadata", None)
+                        try:
+                            await db_call(record_usage, bucket, tokens, getattr(usage, "total_token_count", 0) or 0)
+                        except Exception as exc:
+                            # Accounting must never cost a response we already paid for
+                            logger.warning(f"Could not record Gemini usage for {bucket}: {exc}")
+                        return response
+                    finally:
+                        self.in_flight -= 1
+            finally:
+                if trial and not settled:
+                    # acquire() failed or the caller was cancelled before any outcome:
+                    # free the trial or the breaker stays half-open and refuses everyone
+                    breaker.release_trial()
+            # Back off without holding a slot
+            attempt += 1
+            logger.warning(f"Gemini call failed ({error}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def submit(self, coro: Awaitable) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Runs a coroutine on the engine loop and blocks the calling thread for its result."""
+        return self.submit(coro).result(timeout)
+
+    def imap(self, jobs: Iterable[Tuple[Any, Awaitable]], window: Optional[int] = None) -> Iterator[Tuple[Any, Any]]:
+        """
+        Submits (key, coroutine) pairs, keeping at most `window` pending, and yields
+        (key, result) in completion order. A failed coroutine yields its exception.
+        """
+        window = window or self.max_in_flight * 2
+        pending = {}
+        jobs = iter(jobs)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                try:
+                    key, coro = next(jobs)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[self.submit(coro)] = key
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    yield key, future.result()
+                except Exception as exc:
+                    yield key, exc
+
+
+def _rescore_after_recovery(bucket: str) -> None:
+    """Breaker closed: rescore pairs that got the keyword fallback meanwhile (off the loop thread)."""
+    limit = getattr(settings, "GEMINI_BREAKER_RESCORE_LIMIT", 200)
+    if limit <= 0:
+        return
+
+    def run():
+        from django.db import close_old_connections
+        from .services import rescore_fallback_scores
+
+        close_old_connections()
+        try:
+            rescored = rescore_fallback_scores(limit=limit)
+            logger.info(f"Rescored {rescored} fallback score(s) after {bucket} recovered")
+        except Exception:
+            logger.exception("Rescoring fallback scores after recovery failed")
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=run, name="fallback-rescore", daemon=True).start()
+
+
+def get_scoring_engine() -> ScoringEngine:
+    """Lazily starts the engine (again after a fork, since the loop thread doesn't survive it)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine.pid != os.getpid():
+            _engine = ScoringEngine(getattr(settings, "GEMINI_MAX_IN_FLIGHT", 8))
+            logger.info(f"Started scoring engine (max in flight={_engine.max_in_flight})")
+        return _engine
@@ -763,7 +763,7 @@ import logging
 import re
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from io import BytesIO
 from datetime import datetime, timedelta
 from typing import Iterable, List, Optional, Tuple, Any
@@ -776,8 +776,8 @@ from vertexai import generative_models as vertex_models
 import msal
 import requests
 from django.conf import settings
-from django.db import close_old_connections
-from django.db.models import Q  # <--- NEW IMPORT
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Q, When  # <--- NEW IMPORT
 from django.utils import timezone
 from pypdf import PdfReader
 from docx import Document
@@ -795,7 +795,7 @@ from django.conf import settings
 
 from django.core.mail import send_mail
 
-from .models import ErrorLog, JobDescription, Resume, ResumeScore, ResumeSource
+from .models import ErrorLog, ExtractionCache, JobDescription, JobSpecVersion, Resume, ResumeScore, ResumeSource, ProfileCache, ScoreCache
 
 logger = logging.getLogger(__name__)
 
@@ -835,95 +835,9 @@ def record_error(location: str, message: str, details: str = "", context: Option
 #         text_parts.append(page.extract_text() or "")
 #     return "\n".join(text_parts)
 
-def extract_text_from_pdf(content: bytes, filename: str = "") -> str:
-    """Extracts text from PDF. Returns '' if scanned image."""
-    try:
-        reader = PdfReader(BytesIO(content))
-        text_parts = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_parts.append(text)
-        
-        extracted_text = "\n".join(text_parts)
-        
-        # Validation: If text is suspiciously short, it's likely a scan
-        if len(extracted_text.strip()) < 50:
-            record_error("extract_text_from_pdf", "PDF Text < 50 chars (Likely Scanned Image)", f"File: {filename}")
-            return "" 
-            
-        return extracted_text
-    except Exception as e:
-        record_error("extract_text_from_pdf", f"PDF parsing failed: {str(e)}", f"File: {filename}")
-        return ""
-
-
-# def extract_text_from_docx(content: bytes) -> str:
-#     document = Document(BytesIO(content))
-#     parts = [paragraph.text for paragraph in document.paragraphs]
-#     return "\n".join(parts)
-
-def extract_text_from_docx(content: bytes, filename: str = "") -> str:
-    """Extracts text from paragraphs AND tables in DOCX."""
-    try:
-        document = Document(BytesIO(content))
-        text_parts = []
-
-        # 1. Paragraphs
-        for paragraph in document.paragraphs:
-            if paragraph.text.strip():
-                text_parts.append(paragraph.text.strip())
-
-        # 2. Tables (Crucial for Skills sections)
-        for table in document.tables:
-            for row in table.rows:
-                # Join cells with a pipe | to keep structure
-                row_text = [cell.text.strip() for cell in row.cells if cell.text.strip()]
-                if row_text:
-                    text_parts.append(" | ".join(row_text))
-
-        text = "\n".join(text_parts)
-        if not text:
-            record_error("extract_text_from_docx", "Empty DOCX extraction", f"File: {filename}")
-        return text
-
-    except Exception as e:
-        record_error("extract_text_from_docx", f"DOCX parsing failed: {str(e)}", f"File: {filename}")
-        return ""
-
-
-# def extract_text_from_attachment(name: str, content_bytes: bytes) -> str:
-#     if name.lower().endswith(".pdf"):
-#         return extract_text_from_pdf(content_bytes)
-#     if name.lower().endswith((".docx", ".doc")):
-#         try:
-#             return extract_text_from_docx(content_bytes)
-#         except Exception:
-#             pass
-#     try:
-#         return content_bytes.decode("utf-8", errors="ignore")
-#     except Exception:
-#         return ""
-
 def extract_text_from_attachment(name: str, content_bytes: bytes) -> str:
-    """Master routing function."""
-    name_lower = name.lower()
-    text = ""
-    
-    if name_lower.endswith(".pdf"):
-        text = extract_text_from_pdf(content_bytes, name)
-    elif name_lower.endswith(".docx"):
-        text = extract_text_from_docx(content_bytes, name)
-    elif name_lower.endswith(".doc"):
-        record_error("extract_text_from_attachment", "Unsupported .doc format", f"File: {name}")
-    else:
-        # Fallback
-        try:
-            text = content_bytes.decode("utf-8", errors="ignore")
-        except Exception:
-            pass
-
-    return clean_string(text)
+    """Legacy entry point. Routes through the extractor registry (see extract_document)."""
+    return clean_string(extract_document(content_bytes, filename=name).text)
 
 
 # def clean_string(value: str) -> str:
@@ -1106,16 +1020,20 @@ import docx  # Import python-docx
 
 
 
+import hashlib
 import io
 import logging
 import os
 import re
 import tempfile
+import time
 import pypdf
 import docx
 import pytesseract
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_path, pdfinfo_from_bytes
 # import textract
+import zipfile
+import xml.etree.ElementTree as ET
 from zipfile import BadZipFile
 
 # Configure Logging
@@ -1125,60 +1043,249 @@ logger = logging.getLogger(__name__)
 # If Tesseract is not in your PATH, set it here (Windows users specifically)
 # pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract' 
 
-def extract_text_with_links(file_content, filename=""):
+@dataclass
+class ExtractionResult:
+    text: str = ""
+    links: List[str] = field(default_factory=list)
+    page_count: int = 0
+    method: str = ""            # fast_pdf / fast_pdf+ocr / ocr / fast_docx / antiword / text
+    fallback_used: bool = False  # a costlier extractor had to step in
+    elapsed_ms: int = 0
+    cached: bool = False
+    deferred: bool = False       # costly step skipped (costly=False); text is partial
+
+
+def extract_text_with_links(file_content, filename="", use_cache=True):
+    """Text (with the DETECTED HYPERLINKS footer) for callers that only need a string."""
+    return extract_document(file_content, filename=filename, use_cache=use_cache).text
+
+
+def extract_document(file_content, filename="", use_cache=True, costly=True) -> ExtractionResult:
     """
-    Master extraction function.
+    Master extraction function. Every caller (ingest, rescore, populate) goes through here.
     Strategy:
-    1. Try Fast Extraction (pypdf / python-docx).
-    2. If text is empty or fails, trigger 'Costly Fallback' (OCR / Textract).
+    1. Return the cached result if this exact file was extracted before.
+    2. Sniff the format once and run the single registered extractor for it
+       (in the process pool / sandbox).
+    3. The extractor itself decides on costly fallbacks (page OCR / antiword).
+       With costly=False it skips them and marks the result deferred instead.
     """
-    text = ""
-    
-    # 1. Normalize Input to Stream
+    # 1. Normalize Input to Bytes
     if isinstance(file_content, (bytes, bytearray)):
-        stream = io.BytesIO(file_content)
-        file_bytes = file_content
+        file_bytes = bytes(file_content)
     elif hasattr(file_content, 'read'):
         file_content.seek(0)
         file_bytes = file_content.read()
-        stream = io.BytesIO(file_bytes)
     else:
         logger.error("Invalid file content type")
-        return ""
+        return ExtractionResult()
+
+    cache_enabled = use_cache and getattr(settings, "EXTRACTION_CACHE_ENABLED", True)
+    content_hash = attachment_hash(file_bytes)
+
+    # 2. CACHE LOOKUP (forwarded emails, re-uploads and rescore auto-fix hit this)
+    if cache_enabled:
+        cached = get_cached_extraction(content_hash)
+        if cached is not None:
+            logger.info(f"Extraction cache hit for {filename} ({cached.method})")
+            return ExtractionResult(
+                text=cached.text,
+                links=cached.links or [],
+                page_count=cached.page_count,
+                method=cached.method,
+                fallback_used=cached.fallback_used,
+                elapsed_ms=cached.elapsed_ms,
+                cached=True,
+            )
 
-    # 2. Detect Format
-    is_pdf = filename.lower().endswith('.pdf')
-    is_docx = filename.lower().endswith('.docx') or filename.lower().endswith('.doc')
+    started = time.monotonic()
+    from .extraction_pool import (
+        ExtractionResourceError,
+        ExtractionTimeout,
+        run_extraction_in_pool,
+        run_sandboxed,
+    )
+    # .doc goes through antiword: wait for a slot here, bounded so a stuck queue
+    # gives up like a stuck document does
+    slot = None
+    if costly and sniff_format(file_bytes, filename) == "doc":
+        timeout = getattr(settings, "EXTRACT_TIMEOUT_SECONDS", 0) or -1
+        if not _ANTIWORD_SLOTS.acquire(timeout=timeout):
+            logger.warning(f"No antiword slot for {filename} after {timeout} s")
+            return ExtractionResult(elapsed_ms=int((time.monotonic() - started) * 1000))
+        slot = _ANTIWORD_SLOTS
+        waited_ms = int((time.monotonic() - started) * 1000)
+        if waited_ms:
+            logger.info(f"{filename} waited {waited_ms} ms for an antiword slot")
+    try:
+        # CPU-bound parsing goes to the process pool when EXTRACT_PROCESS_WORKERS > 0
+        result = run_extraction_in_pool(file_bytes, filename, costly)
+        if result is None:
+            result = run_sandboxed(_run_extraction, file_bytes, filename, costly)
+    except (ExtractionTimeout, ExtractionResourceError) as e:
+        # Poison document: give the worker slot back instead of hanging on it
+        record_error(
+            "extract_document",
+            f"Extraction aborted: {e}",
+            f"File: {filename}",
+            context={"sha256": content_hash, "size": len(file_bytes)},
+        )
+        return ExtractionResult(elapsed_ms=int((time.monotonic() - started) * 1000))
+    except Exception as e:
+        logger.error(f"Extraction failed for {filename}: {e}")
+        return ExtractionResult(elapsed_ms=int((time.monotonic() - started) * 1000))
+    finally:
+        if slot is not None:
+            slot.release()
+
+    # Wall time as seen by the caller (includes pool / sandbox overhead)
+    result.elapsed_ms = int((time.monotonic() - started) * 1000)
+    logger.info(
+        f"Extracted {filename} via {result.method or 'none'} in {result.elapsed_ms} ms "
+        f"(pages={result.page_count}, fallback={result.fallback_used}, deferred={result.deferred})"
+    )
+
+    # 3. STORE (empty results are not cached so a transient failure can be retried;
+    #    deferred results are partial, the full run stores them later)
+    if result.deferred:
+        return result
+    if not result.text.strip():
+        record_error(
+            "extract_document",
+            "No text extracted",
+            f"File: {filename}",
+            context={"sha256": content_hash, "method": result.method},
+        )
+    elif cache_enabled:
+        store_cached_extraction(content_hash, result)
 
-    if not is_pdf and not is_docx:
-        # Magic Number Check
-        if file_bytes.startswith(b'%PDF'):
-            is_pdf = True
-        elif file_bytes.startswith(b'PK') or file_bytes.startswith(b'\xD0\xCF\x11\xE0'): # PK=Zip, D0CF=OLE(doc)
-            is_docx = True
+    return result
 
-    # 3. FAST EXTRACTION ATTEMPT
+
+# ==========================================
+# EXTRACTOR REGISTRY
+# ==========================================
+
+EXTRACTORS = {}
+
+
+def register_extractor(fmt: str):
+    def decorator(func):
+        EXTRACTORS[fmt] = func
+        return func
+    return decorator
+
+
+def sniff_format(file_bytes: bytes, filename: str = "") -> str:
+    """Magic bytes first (mislabelled attachments are common), then the extension."""
+    if file_bytes.startswith(b'%PDF'):
+        return "pdf"
+    if file_bytes.startswith(b'PK\x03\x04'):  # OOXML zip
+        return "docx"
+    if file_bytes.startswith(b'\xD0\xCF\x11\xE0'):  # OLE2 (Word 97-2003)
+        return "doc"
+    name = filename.lower()
+    for ext, fmt in ((".pdf", "pdf"), (".docx", "docx"), (".doc", "doc")):
+        if name.endswith(ext):
+            return fmt
+    return "text"
+
+
+def _run_extraction(file_bytes, filename="", costly=True) -> ExtractionResult:
+    """Dispatches one document to its registered extractor."""
+    fmt = sniff_format(file_bytes, filename)
+    started = time.monotonic()
     try:
-        if is_pdf:
-            text = _extract_pdf_fast(stream)
-        elif is_docx:
-            text = _extract_docx_fast(stream)
+        result = EXTRACTORS[fmt](file_bytes, filename, costly=costly)
     except Exception as e:
-        logger.warning(f"Fast extraction failed for {filename}: {e}")
+        logger.warning(f"{fmt} extraction failed for {filename}: {e}")
+        result = ExtractionResult(method=fmt)
+    result.links = result.links or split_detected_links(result.text)
+    result.elapsed_ms = int((time.monotonic() - started) * 1000)
+    return result
 
-    # 4. COSTLY FALLBACK (If fast failed or returned minimal text)
-    # We define "failure" as having less than 50 characters of text
-    if len(text.strip()) < 50:
-        logger.info(f"Triggering COSTLY extraction for {filename}")
-        try:
-            if is_pdf:
-                text = _extract_pdf_ocr(file_bytes)
-            elif is_docx:
-                text = _extract_doc_legacy(file_bytes, filename)
-        except Exception as e:
-            logger.error(f"Costly extraction also failed: {e}")
 
-    return text
+@register_extractor("pdf")
+def _pdf_extractor(file_bytes, filename="", costly=True):
+    # Per-page text layer, OCR only the pages that need it
+    return _extract_pdf_selective(file_bytes, costly=costly)
+
+
+@register_extractor("docx")
+def _docx_extractor(file_bytes, filename="", costly=True):
+    try:
+        text = _extract_docx_stream(file_bytes)
+    except Exception as e:
+        # Malformed XML the streaming reader can't handle: let python-docx try
+        logger.warning(f"Streaming DOCX parse failed for {filename}: {e}")
+        text = _extract_docx_fast(io.BytesIO(file_bytes))
+    # No costly fallback: sniff_format already sends OLE .doc bytes to antiword whatever
+    # the extension, and antiword can't read a zip, so a sparse .docx is what it is
+    return ExtractionResult(text=text, page_count=1, method="fast_docx")
+
+
+@register_extractor("doc")
+def _doc_extractor(file_bytes, filename="", costly=True):
+    if not costly:
+        return ExtractionResult(page_count=1, method="antiword", deferred=True)
+    return ExtractionResult(text=_extract_doc_legacy(file_bytes, filename), page_count=1, method="antiword")
+
+
+@register_extractor("text")
+def _text_extractor(file_bytes, filename="", costly=True):
+    return ExtractionResult(text=file_bytes.decode("utf-8", errors="ignore"), page_count=1, method="text")
+
+# ==========================================
+# EXTRACTION CACHE (content-addressed)
+# ==========================================
+
+# Bump whenever an extractor changes its output so old cache rows are ignored.
+EXTRACTOR_VERSION = "4"
+LINKS_MARKER = "--- DETECTED HYPERLINKS ---"
+
+
+def attachment_hash(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def split_detected_links(text: str) -> List[str]:
+    """Returns the links listed under the DETECTED HYPERLINKS footer."""
+    if not text or LINKS_MARKER not in text:
+        return []
+    footer = text.split(LINKS_MARKER, 1)[1]
+    return [line.strip() for line in footer.splitlines() if line.strip()]
+
+
+def get_cached_extraction(content_hash: str) -> Optional[ExtractionCache]:
+    try:
+        entry = ExtractionCache.objects.filter(
+            content_hash=content_hash,
+            extractor_version=EXTRACTOR_VERSION,
+        ).first()
+        if entry:
+            ExtractionCache.objects.filter(pk=entry.pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+        return entry
+    except Exception as e:
+        logger.warning(f"Extraction cache lookup failed: {e}")
+        return None
+
+
+def store_cached_extraction(content_hash: str, result: ExtractionResult) -> None:
+    try:
+        ExtractionCache.objects.update_or_create(
+            content_hash=content_hash,
+            extractor_version=EXTRACTOR_VERSION,
+            defaults={
+                "text": result.text,
+                "links": result.links,
+                "page_count": result.page_count,
+                "method": result.method,
+                "fallback_used": result.fallback_used,
+                "elapsed_ms": result.elapsed_ms,
+            },
+        )
+    except Exception as e:
+        logger.warning(f"Extraction cache store failed: {e}")
 
 # ==========================================
 # FAST METHODS (Standard Libraries)
@@ -1186,31 +1293,181 @@ def extract_text_with_links(file_content, filename=""):
 
 def _extract_pdf_fast(stream):
     try:
-        reader = pypdf.PdfReader(stream)
-        full_text = []
+        page_texts, found_links, _ = _extract_pdf_pages(stream)
+        return _join_with_links(page_texts, found_links)
+    except Exception:
+        return ""
+
+def _extract_pdf_pages(stream):
+    """pypdf pass that keeps pages separate. Returns (page_texts, links, page_sizes)."""
+    reader = pypdf.PdfReader(stream)
+    page_texts = []
+    page_sizes = []
+    found_links = set()
+
+    for page in reader.pages:
+        page_texts.append(page.extract_text() or "")
+        page_sizes.append((float(page.mediabox.width), float(page.mediabox.height)))
+
+        # Extract Metadata Links
+        if "/Annots" in page:
+            for annot in page["/Annots"]:
+                try:
+                    obj = annot.get_object()
+                    if "/A" in obj and "/URI" in obj["/A"]:
+                        uri = obj["/A"]["/URI"]
+                        if _is_profile_link(uri):
+                            found_links.add(uri)
+                except: continue
+
+    return page_texts, found_links, page_sizes
+
+def _join_with_links(parts, found_links):
+    content = "\n".join(parts)
+    if found_links:
+        content += "\n\n--- DETECTED HYPERLINKS ---\n" + "\n".join(found_links)
+    return content
+
+def _extract_pdf_selective(file_bytes, costly=True):
+    """
+    Text-layer pages keep their pypdf text; only pages with little or no
+    extractable text (scans, image-only pages) are rasterized and OCR'd.
+    OCR output is merged back in page order.
+    With costly=False the OCR is skipped and the result is marked deferred.
+    """
+    try:
+        page_texts, found_links, page_sizes = _extract_pdf_pages(io.BytesIO(file_bytes))
+    except Exception as e:
+        if not costly:
+            return ExtractionResult(method="ocr", deferred=True)
+        # pypdf can't read it at all: OCR everything
+        logger.warning(f"pypdf failed, falling back to full OCR: {e}")
+        text = _extract_pdf_ocr(file_bytes)
+        return ExtractionResult(text=text, method="ocr", fallback_used=True)
+
+    min_chars = getattr(settings, "OCR_PAGE_MIN_CHARS", 50)
+    sparse_pages = [i + 1 for i, text in enumerate(page_texts) if len(text.strip()) < min_chars]
+    if not sparse_pages:
+        return ExtractionResult(
+            text=_join_with_links(page_texts, found_links),
+            links=sorted(found_links),
+            page_count=len(page_texts),
+            method="fast_pdf",
+        )
+    if not costly:
+        return ExtractionResult(
+            text=_join_with_links(page_texts, found_links),
+            links=sorted(found_links),
+            page_count=len(page_texts),
+            method="fast_pdf",
+            deferred=True,
+        )
+
+    logger.info(f"OCR for {len(sparse_pages)} of {len(page_texts)} page(s)")
+    try:
+        ocr_texts = _ocr_pages(file_bytes, sparse_pages, page_sizes)
+    except Exception as e:
+        logger.error(f"OCR Failed: {e}")
+        ocr_texts = []
+    for page_number, ocr_text in zip(sparse_pages, ocr_texts):
+        if len(ocr_text.strip()) > len(page_texts[page_number - 1].strip()):
+            page_texts[page_number - 1] = ocr_text
+
+    return ExtractionResult(
+        text=_join_with_links(page_texts, found_links),
+        links=sorted(found_links),
+        page_count=len(page_texts),
+        method="ocr" if len(sparse_pages) == len(page_texts) else "fast_pdf+ocr",
+        fallback_used=True,
+    )
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+PROFILE_LINK_HOSTS = ["linkedin.com", "github.com"]
+
+
+def _is_profile_link(uri) -> bool:
+    return bool(uri) and any(x in uri for x in PROFILE_LINK_HOSTS)
+
+
+def _docx_hyperlink_targets(zf):
+    """rId -> URL for the external hyperlinks in word/_rels/document.xml.rels."""
+    try:
+        rels_xml = zf.read("word/_rels/document.xml.rels")
+    except KeyError:
+        return {}
+    targets = {}
+    for rel in ET.fromstring(rels_xml):
+        if rel.get("Type", "").endswith("/hyperlink"):
+            targets[rel.get("Id")] = rel.get("Target")
+    return targets
+
+
+def _extract_docx_stream(file_bytes):
+    """
+    Streams word/document.xml out of the zip with iterparse instead of building
+    the python-docx object model. One linear pass collects paragraphs, table rows
+    (cells joined with ' | ', in document order) and hyperlinks; finished
+    paragraphs and rows are cleared so memory stays flat on long CVs.
+    """
+    with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+        link_targets = _docx_hyperlink_targets(zf)
+        lines = []
         found_links = set()
+        runs = []        # text of the paragraph being read
+        rows = []        # stack of open table rows (lists of cell texts)
+        cells = []       # stack of open cells (lists of paragraph texts)
+        skip_depth = 0   # inside mc:Fallback (duplicate of the mc:Choice content)
+
+        with zf.open("word/document.xml") as xml:
+            for event, elem in ET.iterparse(xml, events=("start", "end")):
+                tag = elem.tag
+                if tag == MC_FALLBACK:
+                    skip_depth += 1 if event == "start" else -1
+                    continue
+                if skip_depth:
+                    continue
 
-        for page in reader.pages:
-            text = page.extract_text() or ""
-            full_text.append(text)
-            
-            # Extract Metadata Links
-            if "/Annots" in page:
-                for annot in page["/Annots"]:
-                    try:
-                        obj = annot.get_object()
-                        if "/A" in obj and "/URI" in obj["/A"]:
-                            uri = obj["/A"]["/URI"]
-                            if any(x in uri for x in ["linkedin.com", "github.com"]):
-                                found_links.add(uri)
-                    except: continue
+                if event == "start":
+                    if tag == W_NS + "tr":
+                        rows.append([])
+                    elif tag == W_NS + "tc":
+                        cells.append([])
+                    elif tag == W_NS + "hyperlink":
+                        target = link_targets.get(elem.get(R_NS + "id"))
+                        if _is_profile_link(target):
+                            found_links.add(target)
+                    continue
 
-        content = "\n".join(full_text)
-        if found_links:
-            content += "\n\n--- DETECTED HYPERLINKS ---\n" + "\n".join(found_links)
-        return content
-    except Exception:
-        return ""
+                if tag == W_NS + "t":
+                    runs.append(elem.text or "")
+                elif tag == W_NS + "tab":
+                    runs.append("\t")
+                elif tag in (W_NS + "br", W_NS + "cr"):
+                    runs.append("\n")
+                elif tag == W_NS + "instrText":
+                    # Field-code links: HYPERLINK "https://..."
+                    match = re.search(r'HYPERLINK\s+"([^"]+)"', elem.text or "")
+                    if match and _is_profile_link(match.group(1)):
+                        found_links.add(match.group(1))
+                elif tag == W_NS + "p":
+                    text = "".join(runs).strip()
+                    runs = []
+                    if text:
+                        (cells[-1] if cells else lines).append(text)
+                    elem.clear()
+                elif tag == W_NS + "tc":
+                    cell_text = " ".join(cells.pop())
+                    if rows:
+                        rows[-1].append(cell_text)
+                elif tag == W_NS + "tr":
+                    row = [cell for cell in rows.pop() if cell]
+                    if row:
+                        (cells[-1] if cells else lines).append(" | ".join(row))
+                    elem.clear()
+
+    return _join_with_links(lines, found_links)
 
 def _extract_docx_fast(stream):
     try:
@@ -1244,24 +1501,91 @@ def _extract_docx_fast(stream):
 
 def _extract_pdf_ocr(file_bytes):
     """
-    Uses pdf2image to convert pages to images, then Tesseract OCR to read text.
-    HEAVY PROCESS: High CPU/RAM usage.
+    Rasterizes and OCRs a scanned PDF one page at a time across a small thread
+    pool (Tesseract runs as a subprocess, so threads give real parallelism).
+    Only one page image per worker is alive at once, which keeps a 20-page scan
+    under OCR_MEMORY_LIMIT_MB instead of holding every page in RAM.
     """
     try:
-        # Convert PDF to List of Images
-        images = convert_from_bytes(file_bytes)
-        full_text = []
-        
-        for i, image in enumerate(images):
-            # OCR each page
-            page_text = pytesseract.image_to_string(image)
-            full_text.append(page_text)
-            
-        return "\n".join(full_text)
+        page_sizes = _pdf_page_sizes(file_bytes)
+        if not page_sizes:
+            return ""
+        return "\n".join(_ocr_pages(file_bytes, list(range(1, len(page_sizes) + 1)), page_sizes))
     except Exception as e:
         logger.error(f"OCR Failed: {e}")
         return ""
 
+
+def _pdf_page_sizes(file_bytes):
+    """(width, height) in points per page. Falls back to Letter if pypdf can't read the boxes."""
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(file_bytes))
+        return [(float(page.mediabox.width), float(page.mediabox.height)) for page in reader.pages]
+    except Exception:
+        info = pdfinfo_from_bytes(file_bytes)
+        return [(612.0, 792.0)] * int(info.get("Pages", 0))
+
+
+def _page_raster_bytes(width_pt, height_pt, dpi):
+    # Pages are rasterized as 8-bit grayscale: one byte per pixel
+    return int((width_pt / 72.0 * dpi) * (height_pt / 72.0 * dpi))
+
+
+def _ocr_pages(file_bytes, page_numbers, page_sizes):
+    """
+    OCRs the given 1-based page numbers and returns one text per page, in order.
+    DPI is lowered for oversized pages and the worker count is capped so that
+    (workers x largest page raster) stays within the memory ceiling.
+    """
+    dpi = getattr(settings, "OCR_DPI", 200)
+    max_pages = getattr(settings, "OCR_MAX_PAGES", 20)
+    memory_limit = getattr(settings, "OCR_MEMORY_LIMIT_MB", 256) * 1024 * 1024
+    max_workers = getattr(settings, "OCR_PAGE_WORKERS", 2)
+    # Per-call cap on pdftoppm / tesseract so one page can't hold a thread forever
+    native_timeout = getattr(settings, "EXTRACT_TIMEOUT_SECONDS", 0) or None
+
+    if len(page_numbers) > max_pages:
+        logger.warning(f"OCR capped at {max_pages} of {len(page_numbers)} pages")
+        page_numbers = page_numbers[:max_pages]
+    if not page_numbers:
+        return []
+
+    # 1. Memory plan
+    largest = max(_page_raster_bytes(*page_sizes[n - 1], dpi) for n in page_numbers)
+    page_dpi = dpi
+    if largest > memory_limit:
+        page_dpi = max(72, int(dpi * (memory_limit / largest) ** 0.5))
+        largest = max(_page_raster_bytes(*page_sizes[n - 1], page_dpi) for n in page_numbers)
+    workers = max(1, min(max_workers, memory_limit // max(largest, 1), len(page_numbers)))
+
+    # 2. Write the PDF once; poppler re-reads it per page
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as temp:
+        temp.write(file_bytes)
+        temp.flush()
+
+        def ocr_page(page_number):
+            images = []
+            try:
+                images = convert_from_path(
+                    temp.name,
+                    dpi=page_dpi,
+                    first_page=page_number,
+                    last_page=page_number,
+                    grayscale=True,
+                    timeout=native_timeout,
+                )
+                return pytesseract.image_to_string(images[0], timeout=native_timeout) if images else ""
+            except Exception as e:
+                logger.warning(f"OCR failed for page {page_number}: {e}")
+                return ""
+            finally:
+                for image in images:
+                    image.close()
+
+        # 3. Pages run in parallel but results come back in page order
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(ocr_page, page_numbers))
+
 # def _extract_doc_legacy(file_bytes, original_filename):
 #     """
 #     Handles .doc (Word 97-2003) and stubborn .docx files.
@@ -1289,43 +1613,52 @@ def _extract_pdf_ocr(file_bytes):
 #         logger.error(f"Legacy Doc Extraction Failed: {e}")
 #         return ""
 
+# Caps concurrent antiword runs. Taken by extract_document() in this process around
+# the sandbox / pool call, never inside the sandboxed child: a child killed on
+# timeout would take its slot with it.
+_ANTIWORD_SLOTS = threading.BoundedSemaphore(max(1, getattr(settings, "ANTIWORD_MAX_CONCURRENCY", 2)))
+
+
+def _run_antiword(file_bytes, timeout):
+    """Hands the bytes to antiword through an in-memory file instead of the filesystem."""
+    command = dict(stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    if hasattr(os, "memfd_create"):
+        # antiword needs a seekable path: /dev/fd/N on a memfd is one, with no disk write
+        fd = os.memfd_create("resume.doc")
+        try:
+            with open(fd, "wb", closefd=False) as mem_file:
+                mem_file.write(file_bytes)
+            os.lseek(fd, 0, os.SEEK_SET)
+            return subprocess.run(['antiword', f'/dev/fd/{fd}'], pass_fds=(fd,), **command)
+        finally:
+            os.close(fd)
+
+    # No memfd (non-Linux dev machines): fall back to a temp file
+    with tempfile.NamedTemporaryFile(suffix=".doc") as temp:
+        temp.write(file_bytes)
+        temp.flush()
+        return subprocess.run(['antiword', temp.name], **command)
+
+
 def _extract_doc_legacy(file_bytes, original_filename):
     """
     Handles .doc (Word 97-2003) files using 'antiword' directly via subprocess.
-    Replaces the broken 'textract' library.
+    Runs inside the extraction sandbox; the caller holds the antiword slot.
     """
+    timeout = getattr(settings, "EXTRACT_TIMEOUT_SECONDS", 0) or None
+    started = time.monotonic()
     try:
-        # Create a temp file
-        suffix = ".doc"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp:
-            temp.write(file_bytes)
-            temp_path = temp.name
-
-        try:
-            # DIRECTLY call antiword using subprocess
-            # This bypasses the need for the broken textract Python library
-            result = subprocess.run(
-                ['antiword', temp_path], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE
-            )
-            
-            if result.returncode == 0:
-                text = result.stdout.decode("utf-8", errors='ignore')
-                return text
-            else:
-                logger.error(f"Antiword failed: {result.stderr.decode()}")
-                return ""
-                
-        finally:
-            # Cleanup temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                
+        result = _run_antiword(file_bytes, timeout)
     except Exception as e:
         logger.error(f"Legacy Doc Extraction Failed: {e}")
         return ""
 
+    logger.info(f"antiword {original_filename}: {int((time.monotonic() - started) * 1000)} ms")
+    if result.returncode == 0:
+        return result.stdout.decode("utf-8", errors='ignore')
+    logger.error(f"Antiword failed: {result.stderr.decode(errors='ignore')}")
+    return ""
+
 
 # import json
 # import logging
@@ -1514,35 +1847,243 @@ def _extract_doc_legacy(file_bytes, original_filename):
 import json
 import logging
 import re
-from typing import Optional, Tuple, Iterable, Dict, List
-import google.generativeai as genai
-from google.cloud import aiplatform
+from typing import Any, Callable, Optional, Tuple, Iterable, Dict, List
+import asyncio
 from vertexai.preview.generative_models import GenerativeModel as VertexModel
-import vertexai.generative_models as vertex_models
 from django.conf import settings
 
+from . import singleflight
+from .gemini_clients import get_model_pool
+from .keyword_matcher import compiled_criteria
+from .prompt_packing import CHARS_PER_TOKEN, pack_resume
+from .scoring_engine import get_scoring_engine
+from .structured_output import (
+    COMPACT_MULTI_JOB_SCHEMA,
+    COMPACT_MULTI_RESUME_SCHEMA,
+    COMPACT_SCORE_SCHEMA,
+    MULTI_JOB_SCHEMA,
+    MULTI_RESUME_SCHEMA,
+    PROFILE_SCHEMA,
+    SCORE_SCHEMA,
+    ResponseFormatError,
+    compact_notes_rule,
+    compact_output_format,
+    expand_compact,
+    parse_response,
+    record_parse_failure,
+)
+from .utils import db_call
+
 logger = logging.getLogger(__name__)
 
+# ==========================================
+# SCORE CACHE (resume text x job spec x model x prompt)
+# ==========================================
+
+# Bump whenever the scoring / profile prompts or the way their output is read change.
+SCORING_PROMPT_VERSION = "4"
+PROFILE_PROMPT_VERSION = "2"
+
+
+def resume_text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def job_spec(job, criteria=None) -> dict:
+    """Everything the model sees for a job: name, summary and criteria."""
+    criteria = list(job.criteria.all()) if criteria is None else criteria
+    return {
+        "name": job.name,
+        "summary": job.summary,
+        "criteria": sorted([c.id, c.detail] for c in criteria),
+    }
+
+
+def job_spec_hash(job, criteria=None) -> str:
+    return hashlib.sha256(json.dumps(job_spec(job, criteria), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def spec_version_for(job, criteria=None) -> JobSpecVersion:
+    """
+    The JobSpecVersion for a spec of the job, adding the next number when it's new.
+    criteria=None reads the live spec: anything but the latest version is a change
+    (an edit reverted back still gets a new number). Criteria a run loaded earlier
+    may be behind the latest; they reuse the version they were snapshotted as.
+    """
+    live = criteria is None
+    spec = job_spec(job, criteria)
+    spec_hash = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def existing():
+        latest = job.spec_versions.order_by("-number").first()
+        if latest and latest.spec_hash == spec_hash:
+            return latest, latest
+        if not live:
+            return latest, job.spec_versions.filter(spec_hash=spec_hash).order_by("-number").first()
+        return latest, None
+
+    # Versions are immutable, so the common case (spec unchanged) needs no lock
+    _, version = existing()
+    if version:
+        return version
+    with transaction.atomic():
+        # Job row lock: one writer numbers versions at a time; re-check under it
+        JobDescription.objects.select_for_update().get(pk=job.pk)
+        latest, version = existing()
+        if version:
+            return version
+        version = JobSpecVersion.objects.create(
+            job=job, number=latest.number + 1 if latest else 1, spec_hash=spec_hash, spec=spec
+        )
+    logger.info(f"Job {job.pk} spec is now v{version.number}")
+    return version
+
+
+def stale_scores(job, current: Optional[JobSpecVersion] = None):
+    """Scores of the job computed against another spec than the current one (or an unknown one)."""
+    current = current or spec_version_for(job)
+    return ResumeScore.objects.filter(job=job).filter(
+        Q(spec_version__isnull=True) | ~Q(spec_version__spec_hash=current.spec_hash)
+    )
+
+
+def get_cached_score(resume_hash: str, job_hash: str, model_name: str, since=None) -> Optional[Tuple[float, list]]:
+    """`since`: only an entry stored or used after that time (a coalesced caller reading the leader's result)."""
+    try:
+        entry = ScoreCache.objects.filter(
+            resume_hash=resume_hash,
+            job_hash=job_hash,
+            model_name=model_name,
+            prompt_version=SCORING_PROMPT_VERSION,
+        ).first()
+        if not entry or (since is not None and entry.last_used_at < since):
+            return None
+        ScoreCache.objects.filter(pk=entry.pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+        return entry.total_score, entry.detail
+    except Exception as e:
+        logger.warning(f"Score cache lookup failed: {e}")
+        return None
+
+
+def store_cached_score(resume_hash: str, job_hash: str, model_name: str, total: float, detail: list) -> None:
+    try:
+        ScoreCache.objects.update_or_create(
+            resume_hash=resume_hash,
+            job_hash=job_hash,
+            model_name=model_name,
+            prompt_version=SCORING_PROMPT_VERSION,
+            defaults={"total_score": total, "detail": detail},
+        )
+    except Exception as e:
+        logger.warning(f"Score cache store failed: {e}")
+
+
+def get_cached_profile(resume_hash: str, model_name: str) -> Optional[dict]:
+    try:
+        entry = ProfileCache.objects.filter(
+            resume_hash=resume_hash,
+            model_name=model_name,
+            prompt_version=PROFILE_PROMPT_VERSION,
+        ).first()
+        if not entry:
+            return None
+        ProfileCache.objects.filter(pk=entry.pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+        return entry.profile or {}
+    except Exception as e:
+        logger.warning(f"Profile cache lookup failed: {e}")
+        return None
+
+
+def store_cached_profile(resume_hash: str, model_name: str, profile: dict) -> None:
+    try:
+        ProfileCache.objects.update_or_create(
+            resume_hash=resume_hash,
+            model_name=model_name,
+            prompt_version=PROFILE_PROMPT_VERSION,
+            defaults={"profile": profile},
+        )
+    except Exception as e:
+        logger.warning(f"Profile cache store failed: {e}")
+
+
+# Profile key -> Resume field
+PROFILE_FIELDS = {
+    "name": "candidate_name",
+    "email": "candidate_email",
+    "phone": "candidate_phone",
+    "linkedin_url": "linkedin_profile",
+    "current_role": "candidate_role",
+    "current_company": "candidate_company",
+    "current_location": "candidate_location",
+}
+MISSING_PROFILE_VALUES = {"", "null", "none", "not found", "unable to find", "n/a"}
+
+
+def apply_candidate_profile(resume, profile: dict, overwrite: bool = False) -> list:
+    """
+    Copies the extracted profile onto the resume and saves the changed fields.
+    overwrite=False only fills blanks (ingest); True replaces differing values (rescore).
+    """
+    updated_fields = []
+    for key, field_name in PROFILE_FIELDS.items():
+        value = (profile or {}).get(key)
+        if not isinstance(value, str) or value.strip().lower() in MISSING_PROFILE_VALUES:
+            continue
+        value = value.strip()
+        current = getattr(resume, field_name)
+        if not current or (overwrite and current != value):
+            setattr(resume, field_name, value)
+            updated_fields.append(field_name)
+    if updated_fields:
+        resume.save(update_fields=updated_fields)
+    return updated_fields
+
+
+# ==========================================
+# PRE-SCREEN CASCADE (local score before Gemini)
+# ==========================================
+
+PRESCREEN_NOTE = "Pre-screen keyword match (not sent to Gemini)"
+
+
+def prescreen_cutoff(job, local_scores: Iterable[float] = (), version: Optional[JobSpecVersion] = None) -> Optional[float]:
+    """
+    Lowest local score inside the job's top PRESCREEN_TOP_K, worked out once per job per
+    run and handed to passes_prescreen(). local_scores are the run's own; with `version`,
+    the stored pre-screen scores of that spec version count too. None: no top-K gate.
+    """
+    top_k = getattr(settings, "PRESCREEN_TOP_K", 0)
+    if not getattr(settings, "PRESCREEN_ENABLED", True) or top_k <= 0:
+        return None
+    ranked = [score for score in local_scores if score > 0]
+    if version is not None:
+        ranked += ResumeScore.objects.filter(
+            job=job, spec_version=version, prescreen_score__gt=0
+        ).order_by("-prescreen_score").values_list("prescreen_score", flat=True)[:top_k]
+    ranked.sort(reverse=True)
+    # Fewer than K candidates: any overlap at all is in the top K
+    return ranked[top_k - 1] if len(ranked) >= top_k else 0.0
+
+
+def passes_prescreen(local_score: float, cutoff: Optional[float]) -> bool:
+    """
+    Gate for the cascade: the pair goes to Gemini if its local score clears PRESCREEN_THRESHOLD
+    or reaches the job's top-K cutoff for this run (see prescreen_cutoff).
+    """
+    if not getattr(settings, "PRESCREEN_ENABLED", True):
+        return True
+    if local_score >= getattr(settings, "PRESCREEN_THRESHOLD", 15.0):
+        return True
+    # No overlap at all never rides in on the top K
+    return cutoff is not None and local_score > 0 and local_score >= cutoff
+
+
 class GeminiEvaluator:
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or getattr(settings, 'GEMINI_API_KEY', None)
-        self.vertex_project = getattr(settings, 'VERTEX_PROJECT_ID', None)
-        self.vertex_location = getattr(settings, 'VERTEX_LOCATION', 'us-central1')
-        self.vertex_model_name = getattr(settings, 'VERTEX_MODEL', "gemini-1.5-flash") 
-        self.model = None
-
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel("gemini-2.5-flash")
-            logger.info("Using Gemini API key authentication.")
-        elif self.vertex_project and self.vertex_location:
-            try:
-                aiplatform.init(project=self.vertex_project, location=self.vertex_location)
-                self.model = vertex_models.GenerativeModel(self.vertex_model_name)
-                logger.info(f"Using Vertex AI auth with model: {self.vertex_model_name}")
-            except Exception as exc:
-                logger.exception("Vertex AI init failed")
-        else:
+        # Cheap to construct: the SDK set-up and clients live in the per-process registry
+        self.model = get_model_pool(api_key)
+        self.model_name = self.model.name if self.model else ""
+        if not self.model:
             logger.warning("No Gemini config found. Falling back to keyword matching.")
 
     def _extract_text(self, response) -> str:
@@ -1556,36 +2097,183 @@ class GeminiEvaluator:
             pass
         return ""
 
-    def _parse_json(self, raw: str) -> dict:
-        if not raw: return {}
-        
-        # Clean Markdown ```json ... ```
-        raw = re.sub(r"^```json", "", raw, flags=re.MULTILINE)
-        raw = re.sub(r"^```", "", raw, flags=re.MULTILINE)
-        raw = raw.strip()
-        
+    # ------------------------------------------
+    # Sync entry points (ingest threads, views, commands). The work itself runs
+    # on the process-wide scoring engine, which caps in-flight Gemini calls.
+    # ------------------------------------------
+
+    def extract_candidate_profile(self, resume_text: str, force: bool = False) -> dict:
+        """
+        Candidate metadata (name, contact, LinkedIn, current role/company/location).
+        Depends only on the resume, so it runs once per unique text and is cached in ProfileCache.
+        """
+        return get_scoring_engine().run(self.aextract_candidate_profile(resume_text, force=force))
+
+    def score_resume_against_job(self, resume_text: str, job, force: bool = False) -> Tuple[float, list]:
+        """
+        Returns: (Total Score 0-100, Criteria Details List (Scores 0-10))
+        The candidate profile is a separate stage: see extract_candidate_profile.
+        An unchanged resume + job spec is answered from ScoreCache unless force=True.
+        """
+        criteria = list(job.criteria.all())
+        return get_scoring_engine().run(self.ascore_resume_against_job(resume_text, job, criteria, force=force))
+
+    def score_resume_against_jobs(self, resume_text: str, jobs: List['JobDescription'], force: bool = False) -> Dict[int, Tuple[float, list]]:
+        """
+        Scores one resume against several jobs in a single Gemini call.
+        Returns {job_id: (total, detail)}, the same shape as score_resume_against_job.
+        """
+        job_criteria = [(job, list(job.criteria.all())) for job in jobs]
+        return get_scoring_engine().run(self.ascore_resume_against_jobs(resume_text, job_criteria, force=force))
+
+    # ------------------------------------------
+    # Async core. Runs on the engine loop: no ORM here except through sync_to_async,
+    # and criteria are loaded by the caller.
+    # ------------------------------------------
+
+    async def _agenerate(self, content, generation_config=None) -> str:
+        response = await get_scoring_engine().generate(
+            self.model, content, bucket=self.model_name, generation_config=generation_config
+        )
+        return self._extract_text(response)
+
+    async def _agenerate_json(self, content, schema: dict, prompt_name: str) -> dict:
+        """
+        One answer, strictly parsed against `schema` (also sent to the model when
+        GEMINI_STRUCTURED_OUTPUT is on). A rejected answer is counted and gets one
+        repair retry; raises ResponseFormatError if that fails too.
+        """
+        config = self.model.json_config(schema) if getattr(settings, "GEMINI_STRUCTURED_OUTPUT", True) else None
+        raw = await self._agenerate(content, config)
         try:
-            return json.loads(raw)
-        except json.JSONDecodeError:
-            match = re.search(r"\{.*\}", raw, re.DOTALL)
-            if match:
-                try:
-                    return json.loads(match.group(0))
-                except:
-                    pass
+            return parse_response(raw, schema)
+        except ResponseFormatError as exc:
+            error = exc
+
+        # 1. Count it, then show the model its answer and what was wrong
+        await db_call(record_parse_failure, prompt_name, self.model_name, str(error))
+        logger.warning(f"Rejected Gemini {prompt_name} answer ({error}); one repair retry")
+        repair = list(content) + [
+            f"--- YOUR PREVIOUS ANSWER ---\n{(raw or '')[:4000]}\n\n"
+            f"It was rejected: {error}. Return ONLY the corrected JSON, with the exact structure requested above."
+        ]
+        parsed = parse_response(await self._agenerate(repair, config), schema)
+        await db_call(record_parse_failure, prompt_name, self.model_name, repaired=True)
+        return parsed
+
+    async def aextract_candidate_profile(self, resume_text: str, force: bool = False) -> dict:
+        if not self.model or not resume_text:
+            return {}
+
+        cache_enabled = getattr(settings, "SCORE_CACHE_ENABLED", True)
+        resume_hash = resume_text_hash(resume_text)
+        if cache_enabled and not force:
+            cached = await db_call(get_cached_profile, resume_hash, self.model_name)
+            if cached is not None:
+                return cached
+
+        prompt = (
+            "You are an expert HR assistant. Extract the candidate's details from the resume below.\n\n"
+            "OUTPUT FORMAT:\n"
+            "Return ONLY valid JSON with this exact structure:\n"
+            "{\n"
+            "  \"name\": null,\n"
+            "  \"email\": null,\n"
+            "  \"phone\": null,\n"
+            "  \"linkedin_url\": null,\n"
+            "  \"current_location\": null,\n"
+            "  \"current_company\": null,\n"
+            "  \"current_role\": null\n"
+            "}\n\n"
+            "INSTRUCTIONS:\n"
+            "1. Extract candidate metadata accurately. Use null if not found.\n"
+            "2. **FOR LINKEDIN:** Look for the longest possible URL string. If the text contains 'linkedin.com/in/name-id-123', extract the full ID. Do not truncate at hyphens.\n"
+        )
+        try:
+            profile = await self._agenerate_json(
+                [prompt, f"--- RESUME ---\n{pack_resume(resume_text)}"], PROFILE_SCHEMA, "profile"
+            )
+        except Exception as exc:
+            logger.exception("Gemini profile extraction failed", extra={"error": str(exc)})
             return {}
 
-    def score_resume_against_job(self, resume_text: str, job) -> Tuple[float, list, dict]:
+        if profile and cache_enabled:
+            await db_call(store_cached_profile, resume_hash, self.model_name, profile)
+        return profile or {}
+
+    def _score_cache_key(self, resume_text: str, job, criteria) -> Optional[Tuple[str, str, str]]:
+        if not getattr(settings, "SCORE_CACHE_ENABLED", True):
+            return None
+        return resume_text_hash(resume_text), job_spec_hash(job, criteria), self.model_name
+
+    # ------------------------------------------
+    # Request coalescing: one in-flight call per (resume text, job spec, model).
+    # Other processes read the leader's answer from ScoreCache, so that layer
+    # needs the cache on; otherwise only callers in this process are merged.
+    # ------------------------------------------
+
+    def _flight_key(self, resume_text: str, job, criteria) -> Tuple[str, ...]:
+        return "score", resume_text_hash(resume_text), job_spec_hash(job, criteria), self.model_name
+
+    def _shared_lookup(self, cache_key):
+        if not cache_key:
+            return None
+
+        async def lookup(since):
+            return await db_call(get_cached_score, *cache_key, since=since)
+        return lookup
+
+    async def _claim_flights(self, pairs: dict) -> Tuple[dict, dict]:
         """
-        Returns: (Total Score 0-100, Criteria Details List (Scores 0-10), Candidate Profile Dict)
+        pairs: {ref: (resume_text, job, criteria, cache_key)}. Returns ({ref: flight_key}
+        this caller now leads, {ref: awaitable} for pairs another caller is already scoring).
         """
-        criteria = list(job.criteria.all())
+        led, following = {}, {}
+        for ref, (resume_text, job, criteria, cache_key) in pairs.items():
+            flight = self._flight_key(resume_text, job, criteria)
+            waiter = await singleflight.claim(flight, self._shared_lookup(cache_key))
+            if waiter is None:
+                led[ref] = flight
+            else:
+                following[ref] = waiter
+        return led, following
+
+    async def _land_flights(self, led: dict, results: dict) -> None:
+        for ref, flight in led.items():
+            await singleflight.land(flight, results.get(ref))
+
+    async def _join_flights(self, following: dict, rescore: Callable) -> dict:
+        """Results of the pairs led elsewhere; a pair whose leader failed is scored here after all."""
+        async def join(ref):
+            result = await following[ref]
+            return result if result is not None else await rescore(ref)
+
+        refs = list(following)
+        return dict(zip(refs, await asyncio.gather(*[join(ref) for ref in refs])))
+
+    async def ascore_resume_against_job(self, resume_text: str, job, criteria: list, force: bool = False) -> Tuple[float, list]:
         if not criteria:
-            return 0.0, [], {}
+            return 0.0, []
 
         if not self.model:
-            return self._keyword_score(resume_text, criteria)
+            return self._keyword_score(resume_text, criteria, job=job)
+
+        cache_key = self._score_cache_key(resume_text, job, criteria)
+        if cache_key and not force:
+            cached = await db_call(get_cached_score, *cache_key)
+            if cached is not None:
+                logger.info(f"Score cache hit for job {job.id}")
+                return cached
+
+        # Concurrent requests for the same pair share one call
+        return await singleflight.run(
+            self._flight_key(resume_text, job, criteria),
+            lambda: self._ascore_fresh(resume_text, job, criteria, cache_key),
+            self._shared_lookup(cache_key),
+        )
 
+    async def _ascore_fresh(self, resume_text: str, job, criteria: list, cache_key) -> Tuple[float, list]:
+        """The Gemini call for one pair; the cache was checked and the flight claimed by the caller."""
         # UPDATED PROMPT: 
         # 1. Scores out of 10.
         # 2. Key 'notes' matches your HTML template.
@@ -1618,39 +2306,38 @@ class GeminiEvaluator:
         #     "4. The 'notes' field MUST explain the score based on the resume text.\n"
         # )
 
-        # UPDATED PROMPT with specific URL instructions
+        # Scores only; the candidate profile comes from extract_candidate_profile
+        compact = self._compact_output()
+        if compact:
+            output_format = compact_output_format()
+            notes_rule = compact_notes_rule()
+        else:
+            output_format = (
+                "OUTPUT FORMAT:\n"
+                "Return ONLY valid JSON with this exact structure:\n"
+                "{\n"
+                "  \"scores\": {\n"
+                "     \"reasoning\": \"Brief summary of fit\",\n"
+                "     \"criteria_analysis\": [\n"
+                "        {\"criterion_id\": id, \"title\": \"text\", \"score\": number, \"notes\": \"Specific evidence from resume justifying the score\"}\n"
+                "     ]\n"
+                "  }\n"
+                "}\n\n"
+            )
+            notes_rule = "The 'notes' field MUST explain the score based on the resume text."
         prompt = (
             "You are an expert HR Technical Recruiter. Your task is to analyze a resume against a job description.\n\n"
-            "OUTPUT FORMAT:\n"
-            "Return ONLY valid JSON with this exact structure:\n"
-            "{\n"
-            "  \"candidate_profile\": {\n"
-            "    \"name\": null,\n"
-            "    \"email\": null,\n"
-            "    \"phone\": null,\n"
-            "    \"linkedin_url\": null,\n"
-            "    \"current_location\": null,\n"
-            "    \"current_company\": null,\n"
-            "    \"current_role\": null\n"
-            "  },\n"
-            "  \"scores\": {\n"
-            "     \"reasoning\": \"Brief summary of fit\",\n"
-            "     \"criteria_analysis\": [\n"
-            "        {\"criterion_id\": id, \"title\": \"text\", \"score\": number, \"notes\": \"Specific evidence from resume justifying the score\"}\n"
-            "     ]\n"
-            "  }\n"
-            "}\n\n"
+            + output_format +
             "INSTRUCTIONS:\n"
-            "1. Extract candidate metadata accurately. Return 'unable to find' if not found.\n"
-            "2. **FOR LINKEDIN:** Look for the longest possible URL string. If the text contains 'linkedin.com/in/name-id-123', extract the full ID. Do not truncate at hyphens.\n"
-            "3. Score each criterion on a scale of 0 to 10 (0=No evidence, 10=Perfect Match).\n"
-            "4. BE STRICT. If a skill is missing, score it 0.\n"
-            "5. The 'notes' field MUST explain the score based on the resume text.\n"
+            "1. Score each criterion on a scale of 0 to 10 (0=No evidence, 10=Perfect Match).\n"
+            "2. BE STRICT. If a skill is missing, score it 0.\n"
+            f"3. {notes_rule}\n"
         )
 
         criteria_payload = [{"id": c.id, "detail": c.detail} for c in criteria]
-        clipped_resume = resume_text[:12000] 
-        
+        # Most relevant sections first under the token budget, instead of a blind clip
+        clipped_resume = pack_resume(resume_text, [job.name] + [c.detail for c in criteria])
+
         content = [
             prompt,
             f"--- JOB: {job.name} ---\n{job.summary}\n\n"
@@ -1659,63 +2346,352 @@ class GeminiEvaluator:
         ]
 
         try:
-            # Generate
-            response = self.model.generate_content(content)
-            raw_text = self._extract_text(response)
-            parsed = self._parse_json(raw_text)
+            # Generate (schema-checked; a bad answer after the repair retry raises)
+            if compact:
+                parsed = await self._agenerate_json(content, COMPACT_SCORE_SCHEMA, "score")
+                detail = self._read_detail(parsed, criteria)
+            else:
+                parsed = await self._agenerate_json(content, SCORE_SCHEMA, "score")
+                detail = self._read_detail(parsed["scores"], criteria)
+            if not detail:
+                raise ResponseFormatError("answer does not score every criterion")
 
-            # Unpack
-            profile = parsed.get("candidate_profile", {})
-            score_data = parsed.get("scores", {})
-            detail = score_data.get("criteria_analysis", [])
+            total = self._total_from_detail(detail)
+            if cache_key and detail:
+                await db_call(store_cached_score, *cache_key, total, detail)
+            return total, detail
 
-            # Fallback for bad JSON structure
-            if not detail and "criteria" in parsed:
-                detail = parsed["criteria"]
+        except Exception as exc:
+            logger.exception("Gemini scoring failed", extra={"job": job.id, "error": str(exc)})
+            return self._keyword_score(resume_text, criteria, job=job)
 
-            # --- CALCULATE TOTAL (Normalize 0-10 scale to 0-100) ---
-            total = 0.0
-            if detail:
-                # Sum of (0-10) scores
-                raw_sum = sum(float(d.get("score", 0)) for d in detail)
-                max_possible = len(detail) * 10
-                # Convert to percentage
-                total = (raw_sum / max_possible) * 100.0
+    def _compact_output(self) -> bool:
+        return getattr(settings, "SCORE_COMPACT_OUTPUT", True)
 
-            return total, detail, profile
+    def _read_detail(self, entry: dict, criteria: list) -> list:
+        """
+        Criterion scores from one answer entry, in the stored detail shape and limited to `criteria`.
+        Empty unless every criterion got a score: a partial answer would skew the total.
+        """
+        if "c" in entry:
+            detail = expand_compact(entry["c"], criteria)
+        else:
+            by_id = {}
+            for item in entry.get("criteria_analysis", []) or []:
+                try:
+                    by_id.setdefault(int(item.get("criterion_id")), item)
+                except (TypeError, ValueError):
+                    continue
+            detail = [by_id[c.id] for c in criteria if c.id in by_id]
+        if len(detail) < len(criteria):
+            logger.warning(f"Answer scored {len(detail)} of {len(criteria)} criteria; not using it")
+            return []
+        return detail
+
+    def _total_from_detail(self, detail: list) -> float:
+        """Normalize the 0-10 criterion scores to a 0-100 total."""
+        if not detail:
+            return 0.0
+        raw_sum = sum(float(d.get("score", 0)) for d in detail)
+        return (raw_sum / (len(detail) * 10)) * 100.0
+
+    async def ascore_resume_against_jobs(self, resume_text: str, job_criteria_pairs: list, force: bool = False) -> Dict[int, Tuple[float, list]]:
+        """
+        job_criteria_pairs: [(job, criteria), ...].
+        Cached jobs are left out of the call; jobs the model skips or garbles are rescored one at a time.
+        """
+        results: Dict[int, Tuple[float, list]] = {}
+        job_criteria = {}
+        cache_keys = {}
+        for job, criteria in job_criteria_pairs:
+            if not criteria:
+                results[job.id] = (0.0, [])
+            elif not self.model:
+                results[job.id] = self._keyword_score(resume_text, criteria, job=job)
+            else:
+                cache_keys[job.id] = self._score_cache_key(resume_text, job, criteria)
+                cached = None
+                if cache_keys[job.id] and not force:
+                    cached = await db_call(get_cached_score, *cache_keys[job.id])
+                if cached is not None:
+                    results[job.id] = cached
+                else:
+                    job_criteria[job.id] = (job, criteria)
+
+        if not job_criteria:
+            return results
+
+        # Jobs another caller is already scoring this resume for are awaited, not resent
+        led, following = await self._claim_flights({
+            job_id: (resume_text, job, criteria, cache_keys[job_id]) for job_id, (job, criteria) in job_criteria.items()
+        })
+        try:
+            results.update(await self._ascore_led_jobs(
+                resume_text, {job_id: job_criteria[job_id] for job_id in led}, cache_keys
+            ))
+        finally:
+            await self._land_flights(led, results)
+        results.update(await self._join_flights(
+            following, lambda job_id: self.ascore_resume_against_job(resume_text, *job_criteria[job_id], force=True)
+        ))
+        return results
+
+    async def _ascore_led_jobs(self, resume_text: str, job_criteria: dict, cache_keys: dict) -> Dict[int, Tuple[float, list]]:
+        """The combined call for ascore_resume_against_jobs; job_criteria: {job_id: (job, criteria)} to send."""
+        results: Dict[int, Tuple[float, list]] = {}
+        if not job_criteria:
+            return results
+        if len(job_criteria) == 1:
+            # Cache was already checked and the flight claimed, go straight to the call
+            job, criteria = next(iter(job_criteria.values()))
+            results[job.id] = await self._ascore_fresh(resume_text, job, criteria, cache_keys[job.id])
+            return results
+
+        compact = self._compact_output()
+        if compact:
+            output_format = compact_output_format("j")
+            notes_rule = compact_notes_rule()
+        else:
+            output_format = (
+                "OUTPUT FORMAT:\n"
+                "Return ONLY valid JSON with this exact structure:\n"
+                "{\n"
+                "  \"jobs\": [\n"
+                "    {\n"
+                "      \"job_id\": id,\n"
+                "      \"reasoning\": \"Brief summary of fit for this job\",\n"
+                "      \"criteria_analysis\": [\n"
+                "        {\"criterion_id\": id, \"title\": \"text\", \"score\": number, \"notes\": \"Specific evidence from resume justifying the score\"}\n"
+                "      ]\n"
+                "    }\n"
+                "  ]\n"
+                "}\n\n"
+            )
+            notes_rule = "The 'notes' field MUST explain the score based on the resume text."
+        prompt = (
+            "You are an expert HR Technical Recruiter. Your task is to analyze ONE resume against SEVERAL job descriptions.\n\n"
+            + output_format +
+            "INSTRUCTIONS:\n"
+            "1. Return one entry per job below, with its job id, scoring ONLY that job's criteria.\n"
+            "2. Score each criterion on a scale of 0 to 10 (0=No evidence, 10=Perfect Match).\n"
+            "3. BE STRICT. If a skill is missing, score it 0. Score every job independently.\n"
+            f"4. {notes_rule}\n"
+        )
 
+        job_blocks = []
+        for job, criteria in job_criteria.values():
+            criteria_payload = [{"id": c.id, "detail": c.detail} for c in criteria]
+            job_blocks.append(
+                f"--- JOB {job.id}: {job.name} ---\n{job.summary}\n"
+                f"--- CRITERIA FOR JOB {job.id} ---\n{json.dumps(criteria_payload)}"
+            )
+        # Sections relevant to any of the jobs make the cut
+        queries = [job.name for job, _ in job_criteria.values()]
+        queries += [c.detail for _, criteria in job_criteria.values() for c in criteria]
+        clipped_resume = pack_resume(resume_text, queries)
+        content = [prompt, "\n\n".join(job_blocks) + f"\n\n--- RESUME ---\n{clipped_resume}"]
+
+        try:
+            if compact:
+                parsed = await self._agenerate_json(content, COMPACT_MULTI_JOB_SCHEMA, "score_multi_job")
+                blocks = [(block["id"], block) for block in parsed["j"]]
+            else:
+                parsed = await self._agenerate_json(content, MULTI_JOB_SCHEMA, "score_multi_job")
+                blocks = [(block["job_id"], block) for block in parsed["jobs"]]
+
+            for job_id, block in blocks:
+                try:
+                    job_id = int(job_id)
+                except (TypeError, ValueError):
+                    continue
+                if job_id not in job_criteria or job_id in results:
+                    continue
+                # Keep only this job's criteria so nothing leaks between jobs
+                detail = self._read_detail(block, job_criteria[job_id][1])
+                if detail:
+                    results[job_id] = (self._total_from_detail(detail), detail)
+                    if cache_keys[job_id]:
+                        await db_call(store_cached_score, *cache_keys[job_id], *results[job_id])
         except Exception as exc:
-            logger.exception("Gemini scoring failed", extra={"job": job.id, "error": str(exc)})
-            return self._keyword_score(resume_text, criteria)
+            logger.exception("Gemini multi-job scoring failed", extra={"jobs": list(job_criteria), "error": str(exc)})
+
+        # Anything missing from the combined answer gets its own call (concurrently)
+        missing = [(job, criteria) for job, criteria in job_criteria.values() if job.id not in results]
+        if missing:
+            logger.warning(f"Multi-job response missing {len(missing)} of {len(job_criteria)} job(s); scoring individually")
+            retried = await asyncio.gather(*[
+                self._ascore_fresh(resume_text, job, criteria, cache_keys[job.id]) for job, criteria in missing
+            ])
+            for (job, _), result in zip(missing, retried):
+                results[job.id] = result
+        return results
+
+    async def ascore_resumes_against_job(self, resumes: list, job, criteria: list, force: bool = False) -> Dict[Any, Tuple[float, list]]:
+        """
+        Bulk mode: scores several resumes against ONE job, packing short ones into shared calls.
+        resumes: [(key, resume_text), ...]; returns {key: (total, detail)}.
+        Each resume is isolated: anything a batch answer misses or garbles is retried on its own.
+        """
+        results: Dict[Any, Tuple[float, list]] = {}
+        if not criteria:
+            return {key: (0.0, []) for key, _ in resumes}
+        if not self.model:
+            return {key: self._keyword_score(text, criteria, job=job) for key, text in resumes}
+
+        # 1. Cache
+        texts = {}
+        cache_keys = {}
+        for key, text in resumes:
+            cache_keys[key] = self._score_cache_key(text, job, criteria)
+            cached = None
+            if cache_keys[key] and not force:
+                cached = await db_call(get_cached_score, *cache_keys[key])
+            if cached is not None:
+                results[key] = cached
+            else:
+                texts[key] = text
 
-    def _keyword_score(self, resume_text: str, criteria: Iterable) -> Tuple[float, list, dict]:
-        """Fallback scorer. Returns scores out of 10 for consistency."""
-        resume_lower = resume_text.lower()
+        # 2. Resumes another caller is already scoring for this job are awaited, not resent
+        led, following = await self._claim_flights({
+            key: (text, job, criteria, cache_keys[key]) for key, text in texts.items()
+        })
+        try:
+            results.update(await self._ascore_led_resumes({key: texts[key] for key in led}, job, criteria, cache_keys))
+        finally:
+            await self._land_flights(led, results)
+        results.update(await self._join_flights(
+            following, lambda key: self.ascore_resume_against_job(texts[key], job, criteria, force=True)
+        ))
+        return results
+
+    async def _ascore_led_resumes(self, texts: dict, job, criteria: list, cache_keys: dict) -> Dict[Any, Tuple[float, list]]:
+        """Batched calls for ascore_resumes_against_job; texts: {key: resume_text} to send."""
+        results: Dict[Any, Tuple[float, list]] = {}
+
+        # 1. Pack: short resumes share a call up to the batch budget, long ones go alone
+        batch_budget = getattr(settings, "SCORE_BATCH_TOKEN_BUDGET", 12000)
+        per_resume_max = getattr(settings, "SCORE_BATCH_RESUME_MAX_TOKENS", 1500)
+        max_per_call = max(1, getattr(settings, "SCORE_BATCH_MAX_RESUMES", 8))
+        queries = [job.name] + [c.detail for c in criteria]
+        batches, singles = [], []
+        current, current_tokens = [], 0
+        for key, text in texts.items():
+            # Judged before packing: a long resume keeps its full single-call budget
+            if max_per_call == 1 or len(text or "") // CHARS_PER_TOKEN > per_resume_max:
+                singles.append(key)
+                continue
+            packed = pack_resume(text, queries, token_budget=per_resume_max)
+            tokens = len(packed) // CHARS_PER_TOKEN
+            if current and (current_tokens + tokens > batch_budget or len(current) >= max_per_call):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((key, packed))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        singles += [batch[0][0] for batch in batches if len(batch) == 1]
+        batches = [batch for batch in batches if len(batch) > 1]
+
+        # 2. Batched calls, concurrently
+        await asyncio.gather(*[self._ascore_batch(batch, job, criteria, cache_keys, results) for batch in batches])
+
+        # 3. Long resumes and whatever the batches missed: one call each (cache already checked)
+        retry = singles + [key for key in texts if key not in results and key not in singles]
+        if len(retry) > len(singles):
+            logger.warning(f"Batch responses missed {len(retry) - len(singles)} resume(s) for job {job.id}; scoring individually")
+        scored = await asyncio.gather(*[
+            self._ascore_fresh(texts[key], job, criteria, cache_keys[key]) for key in retry
+        ])
+        results.update(zip(retry, scored))
+        return results
+
+    async def _ascore_batch(self, batch: list, job, criteria: list, cache_keys: dict, results: dict) -> None:
+        """One call for [(key, packed_text), ...]; good blocks go into results, the rest are left out."""
+        compact = self._compact_output()
+        if compact:
+            output_format = compact_output_format("r")
+            notes_rule = compact_notes_rule()
+        else:
+            output_format = (
+                "OUTPUT FORMAT:\n"
+                "Return ONLY valid JSON with this exact structure:\n"
+                "{\n"
+                "  \"resumes\": [\n"
+                "    {\n"
+                "      \"resume_id\": id,\n"
+                "      \"reasoning\": \"Brief summary of fit\",\n"
+                "      \"criteria_analysis\": [\n"
+                "        {\"criterion_id\": id, \"title\": \"text\", \"score\": number, \"notes\": \"Specific evidence from this resume justifying the score\"}\n"
+                "      ]\n"
+                "    }\n"
+                "  ]\n"
+                "}\n\n"
+            )
+            notes_rule = "The 'notes' field MUST explain the score based on that resume's text."
+        prompt = (
+            "You are an expert HR Technical Recruiter. Your task is to analyze SEVERAL resumes against ONE job description.\n\n"
+            + output_format +
+            "INSTRUCTIONS:\n"
+            "1. Return one entry per resume below, with its resume id.\n"
+            "2. Score each criterion on a scale of 0 to 10 (0=No evidence, 10=Perfect Match).\n"
+            "3. BE STRICT. If a skill is missing, score it 0. Judge every resume on its own text only.\n"
+            f"4. {notes_rule}\n"
+        )
+        criteria_payload = [{"id": c.id, "detail": c.detail} for c in criteria]
+        # Positions, not database ids, so the model can't mix up similar numbers
+        labels = {str(position): key for position, (key, _) in enumerate(batch, start=1)}
+        resume_blocks = [f"--- RESUME {position} ---\n{packed}" for position, (_, packed) in enumerate(batch, start=1)]
+        content = [
+            prompt,
+            f"--- JOB: {job.name} ---\n{job.summary}\n\n"
+            f"--- CRITERIA ---\n{json.dumps(criteria_payload)}\n\n" + "\n\n".join(resume_blocks),
+        ]
+
+        try:
+            if compact:
+                parsed = await self._agenerate_json(content, COMPACT_MULTI_RESUME_SCHEMA, "score_batch")
+                blocks = [(block["id"], block) for block in parsed["r"]]
+            else:
+                parsed = await self._agenerate_json(content, MULTI_RESUME_SCHEMA, "score_batch")
+                blocks = [(block["resume_id"], block) for block in parsed["resumes"]]
+        except Exception as exc:
+            logger.exception("Gemini batch scoring failed", extra={"job": job.id, "size": len(batch), "error": str(exc)})
+            return
+
+        for resume_id, block in blocks:
+            try:
+                key = labels.get(str(resume_id).strip())
+                if key is None or key in results:
+                    continue
+                detail = self._read_detail(block, criteria)
+                if not detail:
+                    continue
+                results[key] = (self._total_from_detail(detail), detail)
+                if cache_keys[key]:
+                    await db_call(store_cached_score, *cache_keys[key], *results[key])
+            except Exception as exc:
+                # A bad block only costs that resume a single retry
+                logger.warning(f"Skipping unusable batch block for job {job.id}: {exc}")
+
+    def prescreen(self, resume_text: str, criteria: Iterable, job=None) -> Tuple[float, list]:
+        """Local first-stage score for the cascade, labelled so it isn't mistaken for Gemini's."""
+        return self._keyword_score(resume_text, criteria, job=job, note=PRESCREEN_NOTE)
+
+    def _keyword_score(self, resume_text: str, criteria: Iterable, job=None, note: str = "Fallback keyword match") -> Tuple[float, list]:
+        """
+        Fallback scorer. Returns scores out of 10 for consistency.
+        The criteria are compiled once (cached by their ids and text) and matched in one pass.
+        """
+        criteria = list(criteria)
         detail = []
         total_percent = 0.0
-        
-        for c in criteria:
-            tokens = re.split(r"[,\n;/]+", c.detail)
-            tokens = [t.strip().lower() for t in tokens if len(t.strip()) > 2]
-            
-            if not tokens:
-                score_out_of_10 = 0.0
-            else:
-                token_hits = 0
-                for t in tokens:
-                    if t in resume_lower:
-                        token_hits += 1
-                
-                # Calculate percentage then convert to 0-10
-                percent = (token_hits / len(tokens)) * 100.0
-                percent = min(percent, 100.0)
-                score_out_of_10 = percent / 10.0 # Convert 100 -> 10
-            
+
+        for criterion_id, title, score_out_of_10 in compiled_criteria(job, criteria).score(resume_text):
             detail.append({
-                "criterion_id": c.id,
-                "title": c.detail,
+                "criterion_id": criterion_id,
+                "title": title,
                 "score": round(score_out_of_10, 1), # e.g. 7.5
-                "notes": "Fallback keyword match",
+                "notes": note,
             })
             total_percent += (score_out_of_10 * 10) # Summing up percentages effectively
 
@@ -1724,7 +2700,175 @@ class GeminiEvaluator:
         else:
             total = 0.0
             
-        return total, detail, {}
+        return total, detail
+
+
+# ==========================================
+# FALLBACK RESCORE
+# ==========================================
+
+def is_fallback_detail(detail: list, criteria) -> bool:
+    """
+    True for keyword-fallback results that should get a Gemini rescore. An empty answer
+    counts only when the job has criteria; without any, empty is the real score.
+    """
+    if not detail:
+        return bool(criteria)
+    return any((item.get("notes") or "").lower().startswith("fallback") for item in detail)
+
+
+def rescore_fallback_scores(
+    job_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    force: bool = False,
+    include_screened: bool = False,
+) -> int:
+    """
+    Rescores pairs flagged fallback_scored (and, optionally, pre-screened ones) with Gemini.
+    Flagged rows are claimed first, so the recovery hook and the command don't double up.
+    Returns the number of scores updated.
+    """
+    scorer = GeminiEvaluator()
+    if not scorer.model:
+        return 0
+
+    flagged = Q(fallback_scored=True)
+    if include_screened:
+        flagged |= Q(screened_out=True)
+    qs = ResumeScore.objects.select_related("resume", "job").filter(flagged)
+    if job_id:
+        qs = qs.filter(job_id=job_id)
+    scores = list(qs[:limit] if limit else qs)
+
+    # 1. Claim
+    claimed = [
+        score for score in scores
+        if not score.fallback_scored
+        or ResumeScore.objects.filter(pk=score.pk, fallback_scored=True).update(fallback_scored=False)
+    ]
+    criteria, versions = {}, {}
+    for score in claimed:
+        if score.job_id not in criteria:
+            criteria[score.job_id] = list(score.job.criteria.all())
+            versions[score.job_id] = spec_version_for(score.job, criteria[score.job_id])
+
+    # 2. Calls run concurrently on the scoring engine, within GEMINI_MAX_IN_FLIGHT
+    pending = (
+        (score, scorer.ascore_resume_against_job(score.resume.text_content, score.job, criteria[score.job_id], force=force))
+        for score in claimed
+    )
+    updated = 0
+    for score, outcome in get_scoring_engine().imap(pending):
+        if isinstance(outcome, BaseException):
+            logger.error(f"Fallback rescore failed for score {score.pk}: {outcome}")
+            ResumeScore.objects.filter(pk=score.pk).update(fallback_scored=True)
+            continue
+        total, detail = outcome
+        score.total_score = total
+        score.detail = detail
+        score.screened_out = False
+        # Still a fallback if Gemini failed again; it stays queued for the next recovery
+        score.fallback_scored = is_fallback_detail(detail, criteria[score.job_id])
+        score.spec_version = versions[score.job_id]
+        score.save(update_fields=["total_score", "detail", "screened_out", "fallback_scored", "spec_version"])
+        updated += 1
+    return updated
+
+
+# ==========================================
+# STALE RESCORE
+# ==========================================
+
+# Rescored first after a job changes: candidates in the pipeline, then favourites,
+# then by their previous score
+STALE_PIPELINE_STATUSES = ("SHORTLISTED", "INTERVIEW_SCHEDULED", "INTERVIEW_PASSED")
+
+
+def by_stale_priority(qs):
+    return qs.annotate(
+        stale_priority=Case(
+            When(resume__status__in=STALE_PIPELINE_STATUSES, then=0),
+            When(resume__is_favorite=True, then=1),
+            default=2,
+            output_field=IntegerField(),
+        )
+    ).order_by("stale_priority", "-total_score", "-resume__received_at")
+
+
+def rescore_stale_scores(job_id: Optional[int] = None, limit: Optional[int] = None, force: bool = False) -> int:
+    """
+    Incremental rescore after job edits: only scores whose spec version is behind the
+    job's current one (active jobs, or job_id), in priority order.
+    Returns the number of scores brought up to date.
+    """
+    scorer = GeminiEvaluator()
+    if not scorer.model:
+        return 0
+
+    jobs = JobDescription.objects.filter(pk=job_id) if job_id else JobDescription.objects.filter(active=True)
+    updated = 0
+    for job in jobs:
+        if limit and updated >= limit:
+            break
+        updated += _rescore_stale_for_job(scorer, job, limit - updated if limit else None, force)
+    return updated
+
+
+def _rescore_stale_for_job(scorer: GeminiEvaluator, job: JobDescription, limit: Optional[int], force: bool) -> int:
+    current = spec_version_for(job)
+    criteria = list(job.criteria.all())
+    qs = by_stale_priority(stale_scores(job, current).select_related("resume"))
+    scores = list(qs[:limit] if limit else qs)
+    if not scores:
+        return 0
+    logger.info(f"Rescoring {len(scores)} stale score(s) of job {job.pk} against v{current.number}")
+
+    # 1. Pre-screened pairs are re-screened locally; only those that now pass go to Gemini.
+    #    The top-K cutoff ranks these fresh local scores with the up-to-date stored ones
+    local = {score.pk: scorer.prescreen(score.resume.text_content or "", criteria, job=job) for score in scores}
+    cutoff = prescreen_cutoff(job, [total for total, _ in local.values()], version=current)
+    updated = 0
+    to_score = []
+    for score in scores:
+        local_total, local_detail = local[score.pk]
+        score.prescreen_score = local_total
+        if score.screened_out and not passes_prescreen(local_total, cutoff):
+            score.total_score = local_total
+            score.detail = local_detail
+            score.spec_version = current
+            score.save(update_fields=["total_score", "detail", "prescreen_score", "spec_version"])
+            check_and_process_automation(score)
+            updated += 1
+        else:
+            to_score.append(score)
+
+    # 2. Gemini in priority-ordered groups; short resumes share calls (SCORE_BATCH_*)
+    group_size = max(1, getattr(settings, "SCORE_BATCH_MAX_RESUMES", 8))
+    groups = [to_score[i:i + group_size] for i in range(0, len(to_score), group_size)]
+    pending = (
+        (group, scorer.ascore_resumes_against_job(
+            [(score.pk, score.resume.text_content or "") for score in group], job, criteria, force=force
+        ))
+        for group in groups
+    )
+    for group, outcome in get_scoring_engine().imap(pending):
+        if isinstance(outcome, BaseException):
+            logger.error(f"Stale rescore failed for {len(group)} score(s) of job {job.pk}: {outcome}")
+            continue
+        for score in group:
+            try:
+                score.total_score, score.detail = outcome[score.pk]
+                score.screened_out = False
+                score.fallback_scored = is_fallback_detail(score.detail, criteria)
+                score.spec_version = current
+                score.save(update_fields=[
+                    "total_score", "detail", "prescreen_score", "screened_out", "fallback_scored", "spec_version",
+                ])
+                check_and_process_automation(score)
+                updated += 1
+            except Exception as exc:
+                logger.exception("Stale rescore failed for score", extra={"score_id": score.pk, "error": str(exc)})
+    return updated
 
 
 # @dataclass
@@ -2241,21 +3385,22 @@ class ResumeIngestor:
         scorer: Optional['GeminiEvaluator'] = None,
         uploader: Optional['GoogleStorageUploader'] = None,
         max_workers: Optional[int] = None,
-        score_workers: Optional[int] = None,
+        defer_ocr: Optional[bool] = None,
     ):
         self.scorer = scorer
         # Use the class directly since it's in the same file/module
         self.uploader = uploader or GoogleStorageUploader() 
         
+        # Threads for extraction / upload; Gemini concurrency is capped by the scoring engine
         self.max_workers = max_workers or getattr(settings, "INGEST_MAX_WORKERS", 4)
-        self.score_workers = score_workers or getattr(settings, "INGEST_SCORE_WORKERS", self.max_workers)
-        self._scorer_local = threading.local()
+        # OCR / antiword go to jobs/ocr_queue.py instead of blocking the batch
+        self.defer_ocr = getattr(settings, "OCR_DEFERRED", True) if defer_ocr is None else defer_ocr
 
     def _get_scorer(self) -> 'GeminiEvaluator':
-        """Thread-safe access to GeminiEvaluator"""
-        if not getattr(self._scorer_local, "instance", None):
-            self._scorer_local.instance = self.scorer or GeminiEvaluator()
-        return self._scorer_local.instance
+        """Shared by all ingest threads; the pooled clients behind it are thread-safe."""
+        if self.scorer is None:
+            self.scorer = GeminiEvaluator()
+        return self.scorer
 
     # def _score_resume_for_jobs(self, resume: Resume, text_content: str, jobs: List[JobDescription]) -> None:
     #     if not jobs:
@@ -2320,72 +3465,109 @@ class ResumeIngestor:
     #             except Exception as e:
     #                 logger.error(f"Automation trigger failed for resume {resume.id}: {e}")
 
-    def _score_resume_for_jobs(self, resume: Resume, text_content: str, jobs: List[JobDescription]) -> None:
+    def _score_resume_for_jobs(
+        self,
+        resume: Resume,
+        text_content: str,
+        jobs: List[JobDescription],
+        cutoffs: Optional[Dict[int, Optional[float]]] = None,
+    ) -> None:
+        """cutoffs: the run's top-K pre-screen cutoff per job id (prescreen_cutoff); worked out here if not given."""
         if not jobs:
             return
-        
-        # Limit concurrency to avoid hitting API limits
-        max_workers = max(1, min(self.score_workers, len(jobs)))
 
-        def score_job(job: JobDescription):
-            close_old_connections()
-            scorer = self._get_scorer()
-            try:
-                # Unpack 3 values
-                total, detail, profile = scorer.score_resume_against_job(text_content, job)
-                return job, total, detail, profile
-            finally:
-                close_old_connections()
+        scorer = self._get_scorer()
+        # Criteria are loaded here: the async scorer runs on the engine loop, away from the ORM
+        criteria = {job.id: list(job.criteria.all()) for job in jobs}
+        versions = {job.id: spec_version_for(job, criteria[job.id]) for job in jobs}
+
+        # Stage 1: local pre-screen; only promising pairs go on to Gemini
+        local = {job.id: scorer.prescreen(text_content, criteria[job.id], job=job) for job in jobs}
+        if cutoffs is None:
+            cutoffs = {job.id: prescreen_cutoff(job, version=versions[job.id]) for job in jobs}
+        screened = [
+            job for job in jobs if scorer.model and not passes_prescreen(local[job.id][0], cutoffs.get(job.id))
+        ]
+        llm_jobs = [job for job in jobs if job not in screened]
+        if screened:
+            logger.info(f"Pre-screen kept {len(llm_jobs)} of {len(jobs)} job(s) for resume {resume.id}")
+
+        # Several jobs share one Gemini call (resume sent once); 1 = a call per job
+        per_call = max(1, getattr(settings, "SCORE_MAX_JOBS_PER_CALL", 1))
+        chunks = [llm_jobs[i:i + per_call] for i in range(0, len(llm_jobs), per_call)]
+
+        async def score_chunk(chunk: List[JobDescription]):
+            if len(chunk) == 1:
+                total, detail = await scorer.ascore_resume_against_job(text_content, chunk[0], criteria[chunk[0].id])
+                return [(chunk[0], total, detail)]
+            scored = await scorer.ascore_resume_against_jobs(text_content, [(job, criteria[job.id]) for job in chunk])
+            return [(job, *scored[job.id]) for job in chunk]
+
+        async def score_all():
+            # Profile depends only on the resume: one (cached) call, alongside the job scoring
+            return await asyncio.gather(
+                scorer.aextract_candidate_profile(text_content),
+                *[score_chunk(chunk) for chunk in chunks],
+                return_exceptions=True,
+            )
+
+        # One submission per resume; the engine's semaphore bounds the in-flight calls
+        profile, *chunk_results = get_scoring_engine().run(score_all())
 
         results = []
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_map = {executor.submit(score_job, job): job for job in jobs}
-            for future in as_completed(future_map):
-                try:
-                    job, total, detail, profile = future.result()
-                    results.append((job, total, detail, profile))
-                except Exception as exc:
-                    job_ref = future_map[future]
-                    logger.exception("Scoring failed", extra={"job_id": job_ref.id, "error": str(exc)})
+        for chunk, outcome in zip(chunks, chunk_results):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Scoring failed for jobs {[job.id for job in chunk]}: {outcome}")
+            else:
+                results.extend(outcome)
+        if isinstance(profile, BaseException):
+            logger.error(f"Profile extraction failed for resume {resume.id}: {profile}")
+            profile = {}
+
+        # 1. Update Candidate Metadata (once per resume, blanks only)
+        if profile:
+            apply_candidate_profile(resume, profile)
+
+        # Screened-out pairs keep their labelled local score until promoted by a rescore.
+        # They still go through automation (first, so a Gemini-scored job has the last word)
+        for job in screened:
+            total, detail = local[job.id]
+            score_obj, _ = ResumeScore.objects.update_or_create(
+                resume=resume,
+                job=job,
+                defaults={
+                    "total_score": total,
+                    "detail": detail,
+                    "prescreen_score": total,
+                    "screened_out": True,
+                    "fallback_scored": False,
+                    "spec_version": versions[job.id],
+                },
+            )
+            try:
+                check_and_process_automation(score_obj)
+            except Exception as e:
+                logger.error(f"Automation trigger failed for resume {resume.id}: {e}")
 
         # Process results
-        for job, total, detail, profile in results:
-            
-            # 1. Update Candidate Metadata
-            if profile:
-                updated_fields = []
-                
-                # Helper to update and track fields
-                def update_if_new(field, value):
-                    if value and not getattr(resume, field):
-                        setattr(resume, field, value)
-                        updated_fields.append(field)
-
-                # Standard Fields
-                update_if_new("candidate_name", profile.get("name"))
-                update_if_new("candidate_email", profile.get("email"))
-                update_if_new("candidate_phone", profile.get("phone"))
-                update_if_new("linkedin_profile", profile.get("linkedin_url"))
-                
-                # NEW Fields (Role, Company, Location)
-                update_if_new("candidate_role", profile.get("current_role"))
-                update_if_new("candidate_company", profile.get("current_company"))
-                update_if_new("candidate_location", profile.get("current_location"))
-                
-                if updated_fields:
-                    resume.save(update_fields=updated_fields)
+        for job, total, detail in results:
 
             # 2. Create/Update Score
             score_obj, created = ResumeScore.objects.update_or_create(
                 resume=resume,
                 job=job,
-                defaults={"total_score": total, "detail": detail},
+                defaults={
+                    "total_score": total,
+                    "detail": detail,
+                    "prescreen_score": local[job.id][0],
+                    "screened_out": False,
+                    "fallback_scored": is_fallback_detail(detail, criteria[job.id]),
+                    "spec_version": versions[job.id],
+                },
             )
             
-            # 3. Trigger Automation (Use explicit import)
+            # 3. Trigger Automation
             try:
-                # Import here to avoid circular dependency
-                from .services import check_and_process_automation
                 check_and_process_automation(score_obj)
             except Exception as e:
                 logger.error(f"Automation trigger failed for resume {resume.id}: {e}")
@@ -2475,20 +3657,22 @@ class ResumeIngestor:
     #     finally:
     #         close_old_connections()
 
-    def _ingest_single(self, attachment: AttachmentPayload, jobs: List[JobDescription]) -> int:
+    def _ingest_single(
+        self,
+        attachment: AttachmentPayload,
+        jobs: List[JobDescription],
+        cutoffs: Optional[Dict[int, Optional[float]]] = None,
+    ) -> int:
         close_old_connections()
         try:
-            # 1. Extract Text (Use the NEW robust extractor)
-            # Ensure extract_text_with_links is imported from your utils/services
-            try:
-                from .services import extract_text_with_links
-                # raw_text = extract_text_with_links(attachment.content) # Pass stream/bytes
-                raw_text = extract_text_with_links(attachment.content, filename=attachment.attachment_name)
-            except ImportError:
-                # Fallback if you haven't moved the function yet
-                raw_text = extract_text_from_attachment(attachment.attachment_name, attachment.content)
-            
-            text_content = clean_string(raw_text)
+            # 1. Extract Text (registry + cache; see extract_document)
+            extraction = extract_document(
+                attachment.content,
+                filename=attachment.attachment_name,
+                costly=not self.defer_ocr,
+            )
+            text_content = clean_string(extraction.text)
+            content_hash = attachment_hash(attachment.content)
             
             # 2. Initial Regex Extraction (Fallback)
             phone = extract_phone_number(text_content)
@@ -2517,6 +3701,10 @@ class ResumeIngestor:
                 if phone:
                     query |= Q(candidate_phone=phone)
                 existing_resume = Resume.objects.filter(query).order_by('-received_at').first()
+            if existing_resume is None and extraction.deferred:
+                # No text yet to find the candidate by: the same file re-sent is the same resume
+                existing_resume = Resume.objects.filter(attachment_sha256=content_hash).order_by('-received_at').first()
+            already_queued = bool(existing_resume and existing_resume.extraction_pending)
 
             # 5. Save to DB
             if existing_resume:
@@ -2527,11 +3715,15 @@ class ResumeIngestor:
                 resume.received_at = attachment.received_at
                 resume.message_id = attachment.message_id
                 resume.attachment_name = attachment.attachment_name
+                resume.attachment_sha256 = content_hash
                 
                 if candidate_email and not resume.candidate_email: resume.candidate_email = candidate_email
                 if phone and not resume.candidate_phone: resume.candidate_phone = phone
 
                 resume.status = 'PENDING'
+                resume.extraction_pending = extraction.deferred
+                if not already_queued:
+                    resume.extraction_queued_at = timezone.now() if extraction.deferred else None
                 resume.save()
                 log_activity(resume, 'INGESTED', f"Updated via {attachment.source or 'Unknown'}")
             else:
@@ -2548,12 +3740,25 @@ class ResumeIngestor:
                     received_at=attachment.received_at,
                     source=attachment.source or ResumeSource.EMAIL,
                     is_active_seeker=infer_active_seeker(sender_clean, candidate_email, attachment.source),
-                    status='PENDING'
+                    status='PENDING',
+                    extraction_pending=extraction.deferred,
+                    extraction_queued_at=timezone.now() if extraction.deferred else None,
+                    attachment_sha256=content_hash,
                 )
                 log_activity(resume, 'INGESTED', f"New application via {attachment.source or 'Unknown'}")
 
-            # 6. Score & Enrich
-            self._score_resume_for_jobs(resume, text_content, jobs)
+            # 6. Scanned / legacy file: OCR in the background, scoring follows it
+            if extraction.deferred:
+                if already_queued:
+                    # Its queued extraction is still coming; a second one would do the same work
+                    logger.info(f"Resume {resume.id} already queued for extraction; not queuing it again")
+                    return 1
+                from .ocr_queue import enqueue_extraction
+                enqueue_extraction(resume, attachment.content, jobs, ingestor=self)
+                return 1
+
+            # 7. Score & Enrich
+            self._score_resume_for_jobs(resume, text_content, jobs, cutoffs)
             return 1
 
         except Exception as exc:
@@ -2569,9 +3774,11 @@ class ResumeIngestor:
         jobs = jobs or list(JobDescription.objects.filter(active=True))
         max_workers = max(1, min(self.max_workers, len(attachments)))
         saved_count = 0
-        
+        # One top-K pre-screen cutoff per job for the whole batch, not one per resume
+        cutoffs = {job.id: prescreen_cutoff(job, version=spec_version_for(job)) for job in jobs}
+
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(self._ingest_single, attachment, jobs) for attachment in attachments]
+            futures = [executor.submit(self._ingest_single, attachment, jobs, cutoffs) for attachment in attachments]
             for future in as_completed(futures):
                 try:
                     saved_count += future.result() or 0
@@ -2606,30 +3813,35 @@ class ResumeIngestor:
 #     resume.save(update_fields=["text_content"])
 #     return True
 
+def download_resume_file(resume: Resume, uploader: Optional[GoogleStorageUploader] = None) -> Optional[bytes]:
+    """Fetches the stored original (GCS blob or legacy URL). Raises on transport errors."""
+    uploader = uploader or GoogleStorageUploader()
+    content_bytes: Optional[bytes] = None
+
+    if resume.file_url:
+        # Handle full HTTP URLs (Legacy data or external uploads)
+        if resume.file_url.startswith("http"):
+            resp = requests.get(resume.file_url, timeout=20)
+            if resp.status_code < 400:
+                content_bytes = resp.content
+        # Handle GCS Blob Names (New Standard)
+        else:
+            content_bytes = uploader.download_blob(resume.file_url)
+
+    if not content_bytes:
+        # Last resort: Try downloading by attachment name if path is missing
+        # Construct path: resumes/{message_id}/{attachment_name}
+        fallback_path = f"resumes/{resume.message_id}/{resume.attachment_name}"
+        content_bytes = uploader.download_blob(fallback_path)
+    return content_bytes
+
+
 def populate_resume_text(resume: Resume, uploader: Optional[GoogleStorageUploader] = None) -> bool:
     if resume.text_content:
         return False
 
-    uploader = uploader or GoogleStorageUploader()
-    content_bytes: Optional[bytes] = None
-    
     try:
-        if resume.file_url:
-            # Handle full HTTP URLs (Legacy data or external uploads)
-            if resume.file_url.startswith("http"):
-                resp = requests.get(resume.file_url, timeout=20)
-                if resp.status_code < 400:
-                    content_bytes = resp.content
-            # Handle GCS Blob Names (New Standard)
-            else:
-                content_bytes = uploader.download_blob(resume.file_url)
-
-        if not content_bytes:
-            # Last resort: Try downloading by attachment name if path is missing
-            # Construct path: resumes/{message_id}/{attachment_name}
-            fallback_path = f"resumes/{resume.message_id}/{resume.attachment_name}"
-            content_bytes = uploader.download_blob(fallback_path)
-
+        content_bytes = download_resume_file(resume, uploader)
     except Exception as exc:
         record_error("populate_resume_text", str(exc), resume=resume)
         return False
@@ -2637,8 +3849,8 @@ def populate_resume_text(resume: Resume, uploader: Optional[GoogleStorageUploade
     if not content_bytes:
         return False
 
-    # Extract text using our new robust function
-    text_content = clean_string(extract_text_from_attachment(resume.attachment_name, content_bytes))
+    # Extract text using our new robust function (cached by file hash)
+    text_content = clean_string(extract_document(content_bytes, filename=resume.attachment_name).text)
     
     if not text_content:
         return False
@@ -0,0 +1,148 @@
+# jobs/singleflight.py
+"""
+Request coalescing for scoring calls ("singleflight").
+
+A rescore click on a card, a double-click, rescore_job and watch_inbox can all
+ask for the same (resume text, job spec) pair at once. The first caller leads
+and makes the Gemini call; everyone else waits for it and gets its result.
+
+- Within a process every scoring coroutine runs on the scoring engine loop, so
+  the in-flight table is a plain dict of asyncio futures on that loop.
+- Across processes (Postgres only) the leader also holds a session advisory
+  lock on the key. A caller that can't take it waits until the lock is free and
+  then reads the leader's answer from the shared lookup (ScoreCache). Without a
+  lookup, or on another database, only the in-process layer applies.
+"""
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .utils import db_call, pin_connection, unpin_connection
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.5
+
+# Only touched from the engine loop
+_flights: Dict[Hashable, asyncio.Future] = {}
+_locked: Set[Hashable] = set()
+
+# Shared answer for a key, newer than the given time, or None
+Lookup = Callable[[Any], Awaitable[Optional[Any]]]
+
+
+def _lock_id(key: Hashable) -> int:
+    """Signed 64-bit advisory lock id for a key."""
+    digest = hashlib.sha256(repr(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+# Session advisory locks belong to the connection that took them. db_call runs
+# these on sync_to_async's single thread-sensitive worker, so lock and unlock share
+# one, and a held lock pins it there (db_call won't replace it).
+def _try_lock(key: Hashable) -> bool:
+    if connection.vendor != "postgresql":
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [_lock_id(key)])
+        locked = bool(cursor.fetchone()[0])
+    if locked:
+        pin_connection(key)
+    return locked
+
+
+def _unlock(key: Hashable) -> None:
+    if connection.vendor != "postgresql":
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [_lock_id(key)])
+    finally:
+        # Even if the unlock failed (the lock died with the connection), stop pinning it
+        unpin_connection(key)
+
+
+async def _follow_remote(key: Hashable, lookup: Lookup, future: asyncio.Future) -> Optional[Any]:
+    """Waits for another process's leader to release the key, then reads its answer."""
+    started = timezone.now()
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + getattr(settings, "SCORE_COALESCE_WAIT_SECONDS", 180)
+    result = None
+    try:
+        while loop.time() < give_up_at:
+            await asyncio.sleep(POLL_SECONDS)
+            if await db_call(_try_lock, key):
+                try:
+                    result = await lookup(started)
+                finally:
+                    await db_call(_unlock, key)
+                break
+        else:
+            logger.warning(f"Gave up waiting for another process to score {key!r}")
+    finally:
+        if _flights.get(key) is future:
+            del _flights[key]
+        if not future.done():
+            future.set_result(result)
+    return result
+
+
+async def claim(key: Hashable, lookup: Optional[Lookup] = None) -> Optional[Awaitable]:
+    """
+    Returns None when the caller now leads `key` and must land() it, otherwise an
+    awaitable for the leader's result (None if the leader failed without one).
+    """
+    future = _flights.get(key)
+    if future is not None:
+        # Shielded so a follower giving up doesn't cancel it for the others
+        return asyncio.shield(future)
+    future = asyncio.get_running_loop().create_future()
+    _flights[key] = future
+
+    if lookup is None:
+        return None
+    try:
+        locked = await db_call(_try_lock, key)
+    except Exception as exc:
+        logger.warning(f"Advisory lock unavailable, coalescing in-process only: {exc}")
+        return None
+    if locked:
+        _locked.add(key)
+        return None
+    return _follow_remote(key, lookup, future)
+
+
+async def land(key: Hashable, result: Optional[Any]) -> None:
+    """Publishes the leader's result to its followers and releases the key."""
+    future = _flights.pop(key, None)
+    if future is not None and not future.done():
+        future.set_result(result)
+    if key in _locked:
+        _locked.discard(key)
+        try:
+            await db_call(_unlock, key)
+        except Exception as exc:
+            logger.warning(f"Could not release advisory lock for {key!r}: {exc}")
+
+
+async def run(key: Hashable, factory: Callable[[], Awaitable], lookup: Optional[Lookup] = None) -> Any:
+    """factory() once per key at a time; concurrent callers share the result."""
+    waiter = await claim(key, lookup)
+    if waiter is not None:
+        result = await waiter
+        if result is not None:
+            return result
+        # The leader failed: go ahead uncoordinated rather than fail too
+        return await factory()
+
+    result = None
+    try:
+        result = await factory()
+        return result
+    finally:
+        await land(key, result)
@@ -0,0 +1,235 @@
+# jobs/structured_output.py
+"""
+Response schemas for the Gemini scoring prompts and the strict parser behind them.
+
+With GEMINI_STRUCTURED_OUTPUT on, the schema goes to the model as its
+response_schema, so answers are constrained JSON. Either way an answer is
+parsed in one pass (json.loads of the whole reply, at most one ```json fence
+around it) and checked against the same schema; nothing is dug out of
+surrounding prose. Scoring prompts answer in the compact format by default
+(short keys, criteria referenced by id only), which saves output tokens.
+A failure raises ResponseFormatError, gets one repair retry from the
+evaluator, and is counted in ParseFailureStat.
+"""
+import json
+import logging
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ParseFailureStat
+
+logger = logging.getLogger(__name__)
+
+# Subset of OpenAPI schema accepted by both google.generativeai and Vertex AI
+_CRITERION = {
+    "type": "object",
+    "properties": {
+        "criterion_id": {"type": "integer"},
+        "title": {"type": "string"},
+        "score": {"type": "number"},
+        "notes": {"type": "string"},
+    },
+    "required": ["criterion_id", "score", "notes"],
+}
+_CRITERIA = {"type": "array", "items": _CRITERION}
+
+PROFILE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        field: {"type": "string", "nullable": True}
+        for field in (
+            "name", "email", "phone", "linkedin_url", "current_location", "current_company", "current_role",
+        )
+    },
+}
+
+SCORE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scores": {
+            "type": "object",
+            "properties": {"reasoning": {"type": "string"}, "criteria_analysis": _CRITERIA},
+            "required": ["criteria_analysis"],
+        },
+    },
+    "required": ["scores"],
+}
+
+MULTI_JOB_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "jobs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "integer"},
+                    "reasoning": {"type": "string"},
+                    "criteria_analysis": _CRITERIA,
+                },
+                "required": ["job_id", "criteria_analysis"],
+            },
+        },
+    },
+    "required": ["jobs"],
+}
+
+MULTI_RESUME_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "resumes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "resume_id": {"type": "integer"},
+                    "reasoning": {"type": "string"},
+                    "criteria_analysis": _CRITERIA,
+                },
+                "required": ["resume_id", "criteria_analysis"],
+            },
+        },
+    },
+    "required": ["resumes"],
+}
+
+# Compact mode (SCORE_COMPACT_OUTPUT): short keys, no echoed criterion text, capped
+# notes. expand_compact() turns an answer back into the stored detail shape.
+_COMPACT_CRITERIA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"i": {"type": "integer"}, "s": {"type": "number"}, "n": {"type": "string"}},
+        "required": ["i", "s"],
+    },
+}
+_COMPACT_ITEM = {
+    "type": "object",
+    "properties": {"id": {"type": "integer"}, "c": _COMPACT_CRITERIA},
+    "required": ["id", "c"],
+}
+COMPACT_SCORE_SCHEMA = {"type": "object", "properties": {"c": _COMPACT_CRITERIA}, "required": ["c"]}
+COMPACT_MULTI_JOB_SCHEMA = {
+    "type": "object",
+    "properties": {"j": {"type": "array", "items": _COMPACT_ITEM}},
+    "required": ["j"],
+}
+COMPACT_MULTI_RESUME_SCHEMA = {
+    "type": "object",
+    "properties": {"r": {"type": "array", "items": _COMPACT_ITEM}},
+    "required": ["r"],
+}
+_COMPACT_EXAMPLE = '[{"i": criterion_id, "s": score, "n": "evidence"}]'
+
+
+def compact_output_format(group: str = "") -> str:
+    """OUTPUT FORMAT section of a compact scoring prompt; group is "j" (jobs) or "r" (resumes) for the multi-item prompts."""
+    if group:
+        label = {"j": "job_id", "r": "resume_id"}[group]
+        example = f'{{"{group}": [{{"id": {label}, "c": {_COMPACT_EXAMPLE}}}]}}'
+    else:
+        example = f'{{"c": {_COMPACT_EXAMPLE}}}'
+    return (
+        "OUTPUT FORMAT:\n"
+        "Return ONLY compact JSON (no spaces or line breaks needed) with this exact structure:\n"
+        f"{example}\n"
+        "i = criterion id, s = score, n = evidence. Do not repeat the criterion text.\n\n"
+    )
+
+
+def compact_notes_rule() -> str:
+    limit = getattr(settings, "SCORE_NOTES_MAX_CHARS", 160)
+    return f"'n' MUST quote or summarise the evidence from the resume text behind the score, in at most {limit} characters."
+
+
+def expand_compact(items: list, criteria: Iterable) -> list:
+    """
+    Compact entries back into ResumeScore.detail items (criterion_id, title, score, notes).
+    Titles come from the job's criteria; ids that aren't the job's are dropped.
+    """
+    by_id = {c.id: c for c in criteria}
+    limit = getattr(settings, "SCORE_NOTES_MAX_CHARS", 160)
+    detail = []
+    for item in items:
+        # The schema allows a whole float (3.0) for an integer id
+        try:
+            criterion = by_id.pop(int(item["i"]), None)
+        except (TypeError, ValueError):
+            continue
+        if criterion is None:
+            continue
+        notes = (item.get("n") or "").strip()
+        if len(notes) > limit:
+            notes = notes[:limit - 1].rstrip() + "\u2026"
+        detail.append({"criterion_id": criterion.id, "title": criterion.detail, "score": item["s"], "notes": notes})
+    return detail
+
+
+class ResponseFormatError(ValueError):
+    """The model's answer isn't JSON matching the expected schema."""
+
+
+def _check(value: Any, schema: dict, path: str) -> None:
+    if value is None:
+        if schema.get("nullable"):
+            return
+        raise ResponseFormatError(f"{path} is null")
+
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise ResponseFormatError(f"{path} should be an object")
+        for key in schema.get("required", ()):
+            if key not in value:
+                raise ResponseFormatError(f"{path}.{key} is missing")
+        # Extra keys are ignored, the callers only read what they know
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                _check(value[key], sub_schema, f"{path}.{key}")
+    elif kind == "array":
+        if not isinstance(value, list):
+            raise ResponseFormatError(f"{path} should be an array")
+        for i, item in enumerate(value):
+            _check(item, schema.get("items", {}), f"{path}[{i}]")
+    elif kind == "string":
+        if not isinstance(value, str):
+            raise ResponseFormatError(f"{path} should be a string")
+    elif kind in ("number", "integer"):
+        whole = not isinstance(value, float) or value.is_integer()
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind == "integer" and not whole):
+            raise ResponseFormatError(f"{path} should be {'an integer' if kind == 'integer' else 'a number'}")
+
+
+def parse_response(raw: str, schema: dict) -> dict:
+    """Parses the whole reply as one JSON document and validates it. Raises ResponseFormatError."""
+    text = (raw or "").strip()
+    if text.startswith("```"):
+        # Unconstrained mode: the model may still wrap the answer in one fence
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rstrip()
+        if text.endswith("```"):
+            text = text[:-3]
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError as exc:
+        raise ResponseFormatError(f"invalid JSON ({exc.msg} at char {exc.pos})") from exc
+    _check(value, schema, "$")
+    return value
+
+
+def record_parse_failure(prompt: str, model_name: str, error: str = "", repaired: bool = False) -> None:
+    """Counts a rejected answer, or (repaired=True) a repair retry that fixed one."""
+    try:
+        stat, _ = ParseFailureStat.objects.get_or_create(prompt=prompt, model_name=model_name)
+        if repaired:
+            ParseFailureStat.objects.filter(pk=stat.pk).update(repaired=F("repaired") + 1)
+        else:
+            ParseFailureStat.objects.filter(pk=stat.pk).update(
+                failures=F("failures") + 1, last_error=error[:1000], last_failed_at=timezone.now()
+            )
+    except Exception as exc:
+        # The metric must never cost a score
+        logger.warning(f"Could not record parse failure: {exc}")
@@ -0,0 +1,56 @@
+# jobs/tests.py
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import JobDescription, QualificationCriterion, Resume, ResumeScore
+from .services import AttachmentPayload, ExtractionResult, GeminiEvaluator, ResumeIngestor
+
+
+@override_settings(PRESCREEN_ENABLED=True, PRESCREEN_THRESHOLD=15.0, PRESCREEN_TOP_K=0, AUTO_REJECTION_THRESHOLD=60)
+class PrescreenAutomationTests(TestCase):
+    def setUp(self):
+        self.job = JobDescription.objects.create(name="ICU Nurse", summary="Critical care")
+        QualificationCriterion.objects.create(job=self.job, detail="Registered nurse license")
+        QualificationCriterion.objects.create(job=self.job, detail="ICU patient care")
+        self.resume = Resume.objects.create(
+            message_id="m1", attachment_name="cv.pdf", received_at=timezone.now(), text_content="x"
+        )
+
+    def test_screened_out_pair_is_still_auto_rejected(self):
+        scorer = GeminiEvaluator()
+        # Any model counts: a screened-out pair must never reach it
+        scorer.model = mock.Mock()
+        scorer.aextract_candidate_profile = mock.AsyncMock(return_value={})
+        scorer.ascore_resume_against_job = mock.AsyncMock(side_effect=AssertionError("Gemini was called"))
+        ingestor = ResumeIngestor(scorer=scorer, uploader=mock.Mock())
+
+        ingestor._score_resume_for_jobs(self.resume, "Backend engineer. Python, Django.", [self.job])
+
+        score = ResumeScore.objects.get(resume=self.resume, job=self.job)
+        self.assertTrue(score.screened_out)
+        self.resume.refresh_from_db()
+        self.assertEqual(self.resume.status, "AUTO_REJECTED")
+
+
+class DeferredIngestDedupeTests(TestCase):
+    def test_resent_attachment_waiting_on_ocr_is_not_duplicated(self):
+        ingestor = ResumeIngestor(scorer=mock.Mock(), uploader=mock.Mock(), defer_ocr=True)
+        scanned = ExtractionResult(page_count=1, method="fast_pdf", deferred=True)
+
+        with mock.patch("jobs.services.extract_document", return_value=scanned), \
+                mock.patch("jobs.ocr_queue.enqueue_extraction") as enqueue:
+            for message_id in ("m1", "m2"):
+                attachment = AttachmentPayload(
+                    message_id=message_id,
+                    sender=None,
+                    attachment_name="scan.pdf",
+                    received_at=timezone.now(),
+                    content=b"%PDF-1.4 scanned page",
+                )
+                self.assertEqual(ingestor._ingest_single(attachment, []), 1)
+
+        self.assertEqual(Resume.objects.count(), 1)
+        self.assertEqual(Resume.objects.get().message_id, "m2")
+        enqueue.assert_called_once()
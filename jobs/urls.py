@@ -12,6 +12,7 @@ urlpatterns = [
     path("jobs/<int:pk>/edit/", views.job_edit, name="job_edit"),
     path("jobs/<int:pk>/toggle/", views.toggle_job_active, name="job_toggle"),
     path("jobs/<int:pk>/rescore/", views.rescore_job, name="job_rescore"),
+    path("jobs/<int:pk>/rescore-stale/", views.rescore_stale_job, name="job_rescore_stale"),
     path("scores/<int:score_id>/rescore/", views.rescore_single_score, name="score_rescore"),
     path("resumes/<int:resume_id>/toggle/", views.toggle_resume_flag, name="resume_toggle"),
     path("errors/", views.error_log, name="error_log"),
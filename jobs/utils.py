@@ -1,6 +1,14 @@
 # jobs/utils.py
+import logging
+from typing import Any, Callable, Hashable, Set
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
 from .models import ResumeActivityLog
 
+logger = logging.getLogger(__name__)
+
 def log_activity(resume, action_type, details="", user=None):
     """
     Creates a log entry for a resume.
@@ -14,4 +22,45 @@ def log_activity(resume, action_type, details="", user=None):
             user=user
         )
     except Exception as e:
-        print(f"Failed to log activity: {e}")
\ No newline at end of file
+        print(f"Failed to log activity: {e}")
+
+
+# Session state (advisory locks) held on the thread-sensitive connection. While any
+# is held the connection is left alone, even broken: closing it would release locks
+# other flights still count on. It is replaced once they have all landed.
+_pins: Set[Hashable] = set()
+
+
+def pin_connection(key: Hashable) -> None:
+    _pins.add(key)
+
+
+def unpin_connection(key: Hashable) -> None:
+    _pins.discard(key)
+
+
+def _refresh_connection() -> None:
+    # Like close_old_connections(), minus the CONN_MAX_AGE check: with the default
+    # of 0 that would reconnect on every call. Only a connection that has failed
+    # and no longer answers is replaced.
+    if _pins or connection.connection is None:
+        return
+    if connection.errors_occurred and not connection.is_usable():
+        logger.warning("Replacing broken DB connection on the scoring engine thread")
+        connection.close()
+
+
+def _run_with_connection(func: Callable, args, kwargs) -> Any:
+    _refresh_connection()
+    # No retry here: func may write (cache upserts, the rate-limit bucket). A call that
+    # fails on a dead connection raises, and the next one gets a fresh connection.
+    return func(*args, **kwargs)
+
+
+async def db_call(func: Callable, *args, **kwargs) -> Any:
+    """
+    sync_to_async for ORM work done from the scoring engine loop. Every such call
+    shares asgiref's one thread-sensitive thread, and so one long-lived connection
+    that no request cycle ever checks; this replaces it once it has gone bad.
+    """
+    return await sync_to_async(_run_with_connection)(func, args, kwargs)
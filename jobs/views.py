@@ -46,7 +46,8 @@ from .services import (
 )
 
 import requests
-from .services import extract_text_with_links, GeminiEvaluator, check_and_process_automation
+from .services import extract_document, GeminiEvaluator, apply_candidate_profile, check_and_process_automation, is_fallback_detail
+from .services import rescore_stale_scores, spec_version_for, stale_scores
 
 import os
 import urllib.parse
@@ -88,6 +89,7 @@ def job_create(request):
         if form.is_valid() and formset.is_valid():
             form.save()
             formset.save()
+            spec_version_for(job)
             messages.success(request, "Job description created.")
             return redirect("job_list")
     else:
@@ -109,7 +111,16 @@ def job_edit(request, pk):
         if form.is_valid() and formset.is_valid():
             form.save()
             formset.save()
+            # Any change to name, summary or criteria becomes a new spec version
+            current = spec_version_for(job)
             messages.success(request, "Job description updated.")
+            stale = stale_scores(job, current).count()
+            if stale:
+                messages.info(
+                    request,
+                    f"{stale} score(s) were made against an earlier version of this job. "
+                    "Use \"Rescore changed\" to update just those.",
+                )
             return redirect("job_list")
     else:
         form = JobDescriptionForm(instance=job)
@@ -277,109 +288,181 @@ def rescore_job(request, pk):
         return HttpResponseBadRequest("Invalid method")
     
     job = get_object_or_404(JobDescription, pk=pk)
+    # force=1 bypasses the score cache for a fresh judgement
+    force = request.POST.get("force") == "1"
 
     def run_rescore(job_obj: JobDescription):
         """Background rescore that AUTO-FIXES missing text."""
+        import asyncio
         from django.db import close_old_connections
-        from .services import GeminiEvaluator, check_and_process_automation, extract_text_with_links
+        from .scoring_engine import get_scoring_engine
+        from .services import (
+            GeminiEvaluator,
+            apply_candidate_profile,
+            check_and_process_automation,
+            extract_document,
+            is_fallback_detail,
+            passes_prescreen,
+            prescreen_cutoff,
+            spec_version_for,
+        )
 
         close_old_connections()
         scorer = GeminiEvaluator()
+        criteria = list(job_obj.criteria.all())
+        spec_version = spec_version_for(job_obj, criteria)
+
+        # Top-K pre-screen cutoff for this run, ranked once over every resume's local score
+        # (text still to be repaired below only competes on the threshold)
+        cutoff = prescreen_cutoff(job_obj, (
+            scorer.prescreen(text, criteria, job=job_obj)[0]
+            for text in Resume.objects.exclude(text_content__isnull=True).exclude(text_content="")
+            .values_list("text_content", flat=True).iterator(chunk_size=100)
+        )) if scorer.model else None
         
         # Use iterator to save memory
         qs = Resume.objects.all().iterator(chunk_size=100)
         processed = 0
         fixed_count = 0
-        
-        for resume in qs:
-            try:
-                # --- STEP 1: AUTO-FIX TEXT IF MISSING ---
-                if not resume.text_content or len(resume.text_content.strip()) < 50:
-                    try:
-                        file_content = None
-                        filename = resume.attachment_name or "document.pdf"
-
-                        # Logic to find file locally (Same as Single Rescore)
-                        if resume.file_url:
-                            # Clean URL
-                            relative_path = resume.file_url
-                            if relative_path.startswith(settings.MEDIA_URL):
-                                relative_path = relative_path.replace(settings.MEDIA_URL, "", 1)
+        screened_count = 0
+
+        async def score_group(group):
+            # Bulk mode: short resumes share Gemini calls for this job. Profiles stay
+            # per resume (cached per text, so only a changed resume costs a call)
+            texts = [(resume.id, resume.text_content) for resume, _ in group]
+            return await asyncio.gather(
+                scorer.ascore_resumes_against_job(texts, job_obj, criteria, force),
+                asyncio.gather(*[scorer.aextract_candidate_profile(text) for _, text in texts], return_exceptions=True),
+            )
+
+        def pending_resumes():
+            """Repairs text and pre-screens on this thread; yields the resumes that need Gemini."""
+            nonlocal fixed_count, screened_count
+            for resume in qs:
+                try:
+                    # --- STEP 1: AUTO-FIX TEXT IF MISSING ---
+                    if not resume.text_content or len(resume.text_content.strip()) < 50:
+                        try:
+                            file_content = None
+                            filename = resume.attachment_name or "document.pdf"
+
+                            # Logic to find file locally (Same as Single Rescore)
+                            if resume.file_url:
+                                # Clean URL
+                                relative_path = resume.file_url
+                                if relative_path.startswith(settings.MEDIA_URL):
+                                    relative_path = relative_path.replace(settings.MEDIA_URL, "", 1)
                             
-                            relative_path = urllib.parse.unquote(relative_path)
-                            local_path = os.path.join(settings.MEDIA_ROOT, relative_path)
-
-                            # Try Primary Path
-                            if os.path.exists(local_path):
-                                with open(local_path, 'rb') as f:
-                                    file_content = f.read()
-                            else:
-                                # Try Fallback Path
-                                alt_path = os.path.join("/code", relative_path.lstrip('/'))
-                                if os.path.exists(alt_path):
-                                    with open(alt_path, 'rb') as f:
+                                relative_path = urllib.parse.unquote(relative_path)
+                                local_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+
+                                # Try Primary Path
+                                if os.path.exists(local_path):
+                                    with open(local_path, 'rb') as f:
                                         file_content = f.read()
+                                else:
+                                    # Try Fallback Path
+                                    alt_path = os.path.join("/code", relative_path.lstrip('/'))
+                                    if os.path.exists(alt_path):
+                                        with open(alt_path, 'rb') as f:
+                                            file_content = f.read()
+
+                            # Re-Extract
+                            if file_content:
+                                new_text = extract_document(file_content, filename=filename).text
+                                if new_text and len(new_text) > 50:
+                                    resume.text_content = new_text
+                                    resume.save()
+                                    fixed_count += 1
+                                    logger.info(f"Auto-fixed text for resume {resume.id}")
+                        except Exception as e:
+                            logger.warning(f"Failed to auto-fix resume {resume.id}: {e}")
+
+                    # If text is STILL missing after auto-fix attempt, skip
+                    if not resume.text_content:
+                        continue
+
+                    # --- STEP 2: LOCAL PRE-SCREEN ---
+                    local_total, local_detail = scorer.prescreen(resume.text_content, criteria, job=job_obj)
+                    if scorer.model and not passes_prescreen(local_total, cutoff):
+                        # Not worth a Gemini call, but still auto-rejected like any low score
+                        score_obj, _ = ResumeScore.objects.update_or_create(
+                            resume=resume,
+                            job=job_obj,
+                            defaults={
+                                "total_score": local_total,
+                                "detail": local_detail,
+                                "prescreen_score": local_total,
+                                "screened_out": True,
+                                "fallback_scored": False,
+                                "spec_version": spec_version,
+                            },
+                        )
+                        check_and_process_automation(score_obj)
+                        screened_count += 1
+                        continue
+
+                    yield resume, local_total
+                except Exception as exc:
+                    logger.exception(
+                        "Job rescore failed for resume",
+                        extra={"job_id": job_obj.id, "resume_id": resume.id, "error": str(exc)},
+                    )
 
-                        # Re-Extract
-                        if file_content:
-                            new_text = extract_text_with_links(file_content, filename=filename)
-                            if new_text and len(new_text) > 50:
-                                resume.text_content = new_text
-                                resume.save()
-                                fixed_count += 1
-                                logger.info(f"Auto-fixed text for resume {resume.id}")
-                    except Exception as e:
-                        logger.warning(f"Failed to auto-fix resume {resume.id}: {e}")
-
-                # If text is STILL missing after auto-fix attempt, skip
-                if not resume.text_content:
-                    continue
-                
-                # --- STEP 2: CALL GEMINI ---
-                total_score, details, profile = scorer.score_resume_against_job(resume.text_content, job_obj)
-                
-                # --- STEP 3: UPDATE METADATA (Aggressive Update) ---
-                if profile:
-                    updated = False
+        def resume_groups():
+            """--- STEP 3: QUEUE GEMINI CALLS --- one engine submission per group of resumes."""
+            group_size = max(1, getattr(settings, "SCORE_BATCH_MAX_RESUMES", 8))
+            group = []
+            for item in pending_resumes():
+                group.append(item)
+                if len(group) >= group_size:
+                    yield group, score_group(group)
+                    group = []
+            if group:
+                yield group, score_group(group)
+
+        # The engine keeps a bounded window in flight; results arrive as they finish
+        for group, outcome in get_scoring_engine().imap(resume_groups()):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Rescore failed for {len(group)} resume(s) of job {job_obj.id}: {outcome}")
+                continue
+            scores, profiles = outcome
+
+            # Results are per resume, so one bad item doesn't sink the group
+            for (resume, local_total), profile in zip(group, profiles):
+                try:
+                    total_score, details = scores[resume.id]
+
+                    # --- STEP 4: UPDATE METADATA (Aggressive Update) ---
+                    if not isinstance(profile, BaseException):
+                        apply_candidate_profile(resume, profile, overwrite=True)
+
+                    # --- STEP 5: SAVE SCORE ---
+                    score_obj, created = ResumeScore.objects.update_or_create(
+                        resume=resume, 
+                        job=job_obj, 
+                        defaults={
+                            "total_score": total_score,
+                            "detail": details,
+                            "prescreen_score": local_total,
+                            "screened_out": False,
+                            "fallback_scored": is_fallback_detail(details, criteria),
+                            "spec_version": spec_version,
+                        },
+                    )
                     
-                    # Helper to update if value is different (Better than only if empty)
-                    def update_field(field, value):
-                        if value and getattr(resume, field) != value:
-                            setattr(resume, field, value)
-                            return True
-                        return False
-
-                    if update_field('candidate_name', profile.get('name')): updated = True
-                    if update_field('candidate_email', profile.get('email')): updated = True
-                    if update_field('candidate_phone', profile.get('phone')): updated = True
-                    if update_field('linkedin_profile', profile.get('linkedin_url')): updated = True
+                    # --- STEP 6: AUTOMATION ---
+                    check_and_process_automation(score_obj)
                     
-                    if update_field('candidate_role', profile.get('current_role')): updated = True
-                    if update_field('candidate_company', profile.get('current_company')): updated = True
-                    if update_field('candidate_location', profile.get('current_location')): updated = True
+                    processed += 1
                     
-                    if updated:
-                        resume.save()
-
-                # --- STEP 4: SAVE SCORE ---
-                score_obj, created = ResumeScore.objects.update_or_create(
-                    resume=resume, 
-                    job=job_obj, 
-                    defaults={"total_score": total_score, "detail": details}
-                )
-                
-                # --- STEP 5: AUTOMATION ---
-                check_and_process_automation(score_obj)
-                
-                processed += 1
-                
-            except Exception as exc:
-                logger.exception(
-                    "Job rescore failed for resume",
-                    extra={"job_id": job_obj.id, "resume_id": resume.id, "error": str(exc)},
-                )
+                except Exception as exc:
+                    logger.exception(
+                        "Job rescore failed for resume",
+                        extra={"job_id": job_obj.id, "resume_id": resume.id, "error": str(exc)},
+                    )
                 
-        logger.info(f"Rescore complete. Processed: {processed}, Fixed Text: {fixed_count}")
+        logger.info(f"Rescore complete. Processed: {processed}, Screened out: {screened_count}, Fixed Text: {fixed_count}")
         close_old_connections()
 
     # Start Thread
@@ -389,6 +472,32 @@ def rescore_job(request, pk):
     return redirect(request.META.get("HTTP_REFERER", reverse("job_list")))
 
 
+@login_required
+@require_POST
+def rescore_stale_job(request, pk):
+    """Incremental rescore: only scores made against an older version of the job's spec."""
+    job = get_object_or_404(JobDescription, pk=pk)
+    stale = stale_scores(job).count()
+    if not stale:
+        messages.info(request, f"All scores for {job.name} are up to date.")
+        return redirect(request.META.get("HTTP_REFERER", reverse("job_list")))
+
+    def run_stale_rescore(job_id: int):
+        from django.db import close_old_connections
+
+        close_old_connections()
+        try:
+            updated = rescore_stale_scores(job_id=job_id)
+            logger.info(f"Stale rescore complete for job {job_id}. Updated: {updated}")
+        except Exception as exc:
+            logger.exception("Stale rescore failed", extra={"job_id": job_id, "error": str(exc)})
+        close_old_connections()
+
+    threading.Thread(target=run_stale_rescore, args=(job.pk,), daemon=True).start()
+    messages.info(request, f"Rescoring {stale} out-of-date score(s) for {job.name} in the background.")
+    return redirect(request.META.get("HTTP_REFERER", reverse("job_list")))
+
+
 # @login_required
 # def rescore_single_score(request, score_id):
 #     if request.method != "POST":
@@ -547,10 +656,10 @@ def rescore_single_score(request, score_id):
                 
                 if response.status_code == 200:
                     # Use your NEW robust extractor
-                    new_text = extract_text_with_links(
+                    new_text = extract_document(
                         response.content, 
                         filename=score.resume.attachment_name or "document.pdf"
-                    )
+                    ).text
                     
                     if new_text and len(new_text) > 50:
                         score.resume.text_content = new_text
@@ -566,35 +675,25 @@ def rescore_single_score(request, score_id):
         return respond(False, "No resume text available (and re-extraction failed).")
 
     try:
-        # 1. Call Gemini
-        total, detail, profile = scorer.score_resume_against_job(score.resume.text_content, score.job)
+        # 1. Call Gemini (against the job's current spec version)
+        spec_version = spec_version_for(score.job)
+        total, detail = scorer.score_resume_against_job(
+            score.resume.text_content,
+            score.job,
+            force=request.POST.get("force") == "1",
+        )
         
-        # 2. Update Score
+        # 2. Update Score (a pre-screened pair is promoted to a Gemini score here)
         score.total_score = total
         score.detail = detail
-        score.save(update_fields=["total_score", "detail"])
+        score.screened_out = False
+        score.fallback_scored = is_fallback_detail(detail, spec_version.spec.get("criteria"))
+        score.spec_version = spec_version
+        score.save(update_fields=["total_score", "detail", "screened_out", "fallback_scored", "spec_version"])
         
-        # 3. Update Metadata (Force Update)
-        if profile:
-            resume = score.resume
-            updated_fields = []
-            
-            def update_field(field, value):
-                # Update if value exists and is different
-                if value or getattr(resume, field) != value:
-                    setattr(resume, field, value)
-                    updated_fields.append(field)
-
-            update_field('candidate_name', profile.get('name'))
-            update_field('candidate_email', profile.get('email'))
-            update_field('candidate_phone', profile.get('phone'))
-            update_field('linkedin_profile', profile.get('linkedin_url'))
-            update_field('candidate_role', profile.get('current_role'))
-            update_field('candidate_company', profile.get('current_company'))
-            update_field('candidate_location', profile.get('current_location'))
-            
-            if updated_fields:
-                resume.save(update_fields=updated_fields)
+        # 3. Update Metadata (Force Update; profile is cached per resume text)
+        profile = scorer.extract_candidate_profile(score.resume.text_content)
+        apply_candidate_profile(score.resume, profile, overwrite=True)
 
         # 4. Trigger Automation
         check_and_process_automation(score)
@@ -1106,10 +1205,13 @@ def dashboard(request):
                 else:
                     signed = uploader.signed_url_for_blob(resume.file_url)
             resume.signed_url = signed
-            # Populate text if missing (optional lazy load)
-            if not resume.text_content:
+            # Populate text if missing (optional lazy load; OCR queue owns pending ones)
+            if not resume.text_content and not resume.extraction_pending:
                 populate_resume_text(resume, uploader)
 
+    # Resumes still waiting on OCR have no scores yet; surface them separately
+    pending_extractions = Resume.objects.filter(extraction_pending=True).order_by("-received_at")
+
     # Chat Session Logic (Unchanged)
     chat_session = None
     chat_messages = []
@@ -1170,6 +1272,8 @@ def dashboard(request):
             "chat_messages": chat_messages,
             "show_results": show_results,
             "current_tab": current_tab, # Pass tab to UI so we can highlight the active button
+            "pending_extraction_count": pending_extractions.count(),
+            "pending_extractions": pending_extractions[:5],
         },
     )
 
@@ -1225,6 +1329,11 @@ def upload_resumes(request):
             try:
                 saved = ingestor.ingest(attachments, jobs=[job])
                 ingest_result = saved
+                # Scanned files come back immediately and are scored once the OCR queue finishes
+                pending = Resume.objects.filter(
+                    message_id__in=[a.message_id for a in attachments],
+                    extraction_pending=True,
+                ).count()
                 new_scores = list(
                     ResumeScore.objects.select_related("resume", "job").filter(
                         resume__message_id__in=[a.message_id for a in attachments],
@@ -1251,10 +1360,14 @@ def upload_resumes(request):
                     {"scores": new_scores, "selected_job": job, "criteria_map": {}, "view_mode": "table"},
                     request=request,
                 )
+                message = f"Uploaded and scored {saved - pending} resume(s)."
+                if pending:
+                    message += f" {pending} queued for OCR; they will be scored when ready."
                 payload = {
                     "success": True,
-                    "message": f"Uploaded and scored {saved} resume(s).",
+                    "message": message,
                     "count": saved,
+                    "pending": pending,
                     "job_id": job.id,
                     "job_name": job.name,
                     "cards_html": cards_html,